@@ -1,8 +1,14 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Optional, Tuple
 import os
+import backtest_metrics
+import backtest_store
+from backtest_store import BacktestStore
+import minute_bars
+import r_breaker
+import rolling
 
 # 更改字体
 plt.rcParams['font.family'] = 'SimSun'
@@ -17,26 +23,42 @@ def read_stock_data(file_path: str) -> pd.DataFrame:
 def calculate_custom_indicator(df: pd.DataFrame) -> pd.DataFrame:
     """计算自定义指标"""
     df['LC'] = df['close'].shift(1)
-    df['VID'] = df['volume'].rolling(2).sum() / ((df['high'].rolling(2).max() - df['low'].rolling(2).min()) * 100)
+    high_2, low_2 = rolling.rolling_high_low(df['high'], df['low'], [2])[2]
+    df['VID'] = rolling.rolling_mean(df['volume'], [2])[2] * 2 / ((high_2 - low_2) * 100)
     df['RC'] = (df['close'] - df['LC']) * df['VID']
     df['LONG'] = df['RC'].cumsum()
-    
-    df['DIFF'] = df['LONG'].rolling(10).mean()
-    df['DEA'] = df['LONG'].rolling(20).mean()
+
+    means = rolling.rolling_mean(df['LONG'], [10, 20])
+    df['DIFF'] = means[10]
+    df['DEA'] = means[20]
     df['LON'] = df['DIFF'] - df['DEA']
-    df['LLL'] = df['LON'].rolling(10).mean()
-    
-    df['V2'] = df['LON'].ewm(span=1).mean()
-    df['V3'] = df['V2'].ewm(span=3).mean()
-    df['V4'] = df['V3'].ewm(span=3).mean()
-    df['V5'] = df['V4'].ewm(span=3).mean()
-    df['V6'] = df['V5'].ewm(span=3).mean()
+    df['LLL'] = rolling.rolling_mean(df['LON'], [10])[10]
+
+    # V2 至 V6 为依次嵌套的 EMA，一次遍历同时算出
+    for name, values in zip(('V2', 'V3', 'V4', 'V5', 'V6'), rolling.ema_chain(df['LON'], [1, 3, 3, 3, 3], adjust=True)):
+        df[name] = values
 
     df['buy_signal'] = np.where(df['V2'] > df['V2'].shift(1), 1, 0)
     df['sell_signal'] = np.where(df['V2'] < df['V2'].shift(1), 1, 0)
     
     return df
 
+def calculate_r_breaker_indicator(df: pd.DataFrame) -> pd.DataFrame:
+    """计算R-Breaker价位与信号，做多信号对应买入，做空信号对应卖出"""
+    current, signal, position = r_breaker.signals(df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy())
+    for name, values in current.items():
+        df[name] = values
+    df['RB_Signal'] = signal
+    df['RB_Position'] = position
+    df['buy_signal'] = (signal > 0).astype(int)
+    df['sell_signal'] = (signal < 0).astype(int)
+    return df
+
+STRATEGIES = {
+    'custom': calculate_custom_indicator,
+    'r_breaker': calculate_r_breaker_indicator,
+}
+
 def backtest_strategy(df: pd.DataFrame, 
                       initial_capital: float = 500000, 
                       position_ratio: float = 0.3, 
@@ -50,73 +72,134 @@ def backtest_strategy(df: pd.DataFrame,
     :param position_ratio: 仓位比例，默认0.3（30%仓位）
     :param stop_loss_pct: 止损百分比，默认5%
     :param take_profit_pct: 止盈百分比，默认10%
-    :return: 包含回测结果的字典和更新后的DataFrame
+    :return: 包含回测结果的字典和更新后的DataFrame（新增 position 持股数、cash、stock_holding 持仓市值、total_asset 列）
     """
+    close = df['close'].to_numpy(dtype=np.float64)
+    buy = df['buy_signal'].to_numpy()
+    sell = df['sell_signal'].to_numpy()
+    positions = np.zeros(len(df), dtype=np.int64)
+    cash_values = np.full(len(df), float(initial_capital))
+
     cash = initial_capital
     stock_holding = 0
     entry_price = 0
 
-    df['position'] = 0
-    df['cash'] = initial_capital
-    df['stock_holding'] = 0
-    df['total_asset'] = initial_capital
-
     for i in range(1, len(df)):
         available_cash = cash * position_ratio
 
-        current_price = df['close'].iloc[i]
+        current_price = close[i]
 
         # 买入信号
-        if df['buy_signal'].iloc[i] == 1 and stock_holding == 0:
+        if buy[i] == 1 and stock_holding == 0:
             stock_holding = int(available_cash // current_price)
             entry_price = current_price
             cash -= stock_holding * entry_price
-            df.loc[df.index[i], 'position'] = stock_holding
 
         # 卖出信号或止盈止损
         elif stock_holding > 0:
             current_return = (current_price - entry_price) / entry_price
 
-            if df['sell_signal'].iloc[i] == 1 or current_return >= take_profit_pct or current_return <= -stop_loss_pct:
+            if sell[i] == 1 or current_return >= take_profit_pct or current_return <= -stop_loss_pct:
                 cash += stock_holding * current_price
                 stock_holding = 0
-                df.loc[df.index[i], 'position'] = 0
 
-        # 更新每日资产状况
-        df.loc[df.index[i], 'cash'] = cash
-        df.loc[df.index[i], 'stock_holding'] = stock_holding * current_price
-        df.loc[df.index[i], 'total_asset'] = cash + df.loc[df.index[i], 'stock_holding']
+        # 记录每日持股数和现金
+        positions[i] = stock_holding
+        cash_values[i] = cash
 
-    # 计算策略收益和风险指标
-    df['daily_return'] = df['total_asset'].pct_change()
-    df['strategy_return'] = (1 + df['daily_return']).cumprod() * initial_capital
-    df['drawdown'] = (df['strategy_return'] / df['strategy_return'].cummax()) - 1
+    df['position'] = positions
+    df['cash'] = cash_values
+    df['stock_holding'] = positions * close
+    df['total_asset'] = df['cash'] + df['stock_holding']
 
-    total_return = (df['total_asset'].iloc[-1] - initial_capital) / initial_capital
-    max_drawdown = df['drawdown'].min()
-    
-    # 处理可能的 NaN 值
-    if np.isnan(df['daily_return']).all():
-        sharpe_ratio = 0
-    else:
-        sharpe_ratio = np.sqrt(252) * df['daily_return'].mean() / df['daily_return'].std()
-    
-    non_zero_returns = df['daily_return'][df['daily_return'] != 0]
-    if len(non_zero_returns) > 0:
-        win_rate = len(non_zero_returns[non_zero_returns > 0]) / len(non_zero_returns)
-    else:
-        win_rate = 0
-
-    results = {
-        'total_return': total_return,
-        'max_drawdown': max_drawdown,
-        'sharpe_ratio': sharpe_ratio,
-        'win_rate': win_rate,
-        'final_asset': df['total_asset'].iloc[-1]
-    }
+    # 资产曲线指标与逐笔交易指标，胜率为盈利交易占全部交易的比例
+    results = backtest_metrics.summarize(df['total_asset'].to_numpy(), positions, close, initial_capital)
 
     return results, df
 
+def backtest_stream(chunks: Iterable[pd.DataFrame],
+                    initial_capital: float = 500000,
+                    position_ratio: float = 0.3,
+                    stop_loss_pct: float = 0.05,
+                    take_profit_pct: float = 0.10) -> Tuple[Dict[str, Any], pd.DataFrame]:
+    """
+    逐块回测，交易规则与 backtest_strategy 相同，适合分钟线等长序列
+
+    块之间只传递现金、持仓和开仓价，每块只保留各交易日收盘时的资产；
+    交易在循环中逐笔记录，回撤持续期等资产曲线指标按日计算。
+
+    :param chunks: 按时间顺序产出的、包含交易信号的DataFrame块
+    :return: 包含回测结果的字典和按日的资产DataFrame；没有数据时资产保持初始资金、资产DataFrame为空
+    """
+    cash = initial_capital
+    stock_holding = 0
+    entry_price = 0
+    entry_bar = 0
+    bar = -1
+    daily = []
+    trades = []  # (开仓K线, 平仓K线, 持股数, 开仓价, 平仓价)
+
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        close = chunk['close'].to_numpy(dtype=np.float64)
+        buy = chunk['buy_signal'].to_numpy()
+        sell = chunk['sell_signal'].to_numpy()
+        cash_values = np.empty(len(chunk))
+        holding_values = np.empty(len(chunk))
+
+        for i in range(len(chunk)):
+            current_price = close[i]
+            bar += 1
+            # 与 backtest_strategy 一致，第一根K线不交易
+            if bar > 0:
+                if buy[i] == 1 and stock_holding == 0:
+                    stock_holding = int(cash * position_ratio // current_price)
+                    entry_price = current_price
+                    entry_bar = bar
+                    cash -= stock_holding * entry_price
+                elif stock_holding > 0:
+                    current_return = (current_price - entry_price) / entry_price
+                    if sell[i] == 1 or current_return >= take_profit_pct or current_return <= -stop_loss_pct:
+                        cash += stock_holding * current_price
+                        trades.append((entry_bar, bar, stock_holding, entry_price, current_price))
+                        stock_holding = 0
+            cash_values[i] = cash
+            holding_values[i] = stock_holding * current_price
+
+        frame = pd.DataFrame({'cash': cash_values, 'stock_holding': holding_values}, index=chunk.index)
+        frame['total_asset'] = frame['cash'] + frame['stock_holding']
+        daily.append(frame.groupby(frame.index.normalize()).last())
+
+    if not daily:
+        results = backtest_metrics.equity_metrics(np.array([float(initial_capital)]), initial_capital)
+        results.update(backtest_metrics.trade_metrics(backtest_metrics.make_trades([], [], [], [], [])))
+        return results, pd.DataFrame(columns=['cash', 'stock_holding', 'total_asset'], index=pd.DatetimeIndex([]), dtype=float)
+
+    equity = pd.concat(daily)
+    equity = equity.groupby(level=0).last()
+
+    # 结束时仍持仓的交易按最后价格计算
+    closed = [True] * len(trades)
+    if stock_holding > 0:
+        trades.append((entry_bar, bar, stock_holding, entry_price, current_price))
+        closed.append(False)
+    trade_records = backtest_metrics.make_trades(*(list(column) for column in zip(*trades)), closed) if trades \
+        else backtest_metrics.make_trades([], [], [], [], [])
+    results = backtest_metrics.equity_metrics(equity['total_asset'].to_numpy(), initial_capital)
+    results.update(backtest_metrics.trade_metrics(trade_records))
+    return results, equity
+
+def print_results(stock_code: str, results: Dict[str, Any]):
+    """输出回测指标"""
+    print(f"{stock_code} 回测结果：")
+    print(f"总收益率: {results['total_return']:.2%}（年化 {results['annual_return']:.2%}）")
+    print(f"最大回撤: {results['max_drawdown']:.2%}，最长回撤持续 {results['max_drawdown_duration']} 个周期")
+    print(f"夏普比率: {results['sharpe_ratio']:.2f}，索提诺比率: {results['sortino_ratio']:.2f}，卡玛比率: {results['calmar_ratio']:.2f}")
+    print(f"交易次数: {results['trades']}，胜率: {results['win_rate']:.2%}，盈亏比: {results['profit_factor']:.2f}，"
+          f"平均持有 {results['avg_holding']:.1f} 个周期")
+    print(f"最终资产: ¥{results['final_asset']:,.2f}")
+
 def plot_results(df: pd.DataFrame, stock_code: str):
     """绘制回测结果图表"""
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10), sharex=True)
@@ -141,40 +224,70 @@ def plot_results(df: pd.DataFrame, stock_code: str):
     plt.tight_layout()
     plt.show()
 
-def run_backtest(stock_code: str, file_path: str, initial_capital: float = 500000, position_ratio: float = 0.3):
-    """运行单个股票的回测"""
-    print(f"正在回测 {stock_code}...")
+def run_backtest(stock_code: str, file_path: str, initial_capital: float = 500000, position_ratio: float = 0.3,
+                 strategy: str = 'custom', store: Optional[BacktestStore] = None):
+    """
+    运行单个股票的回测，strategy 可选 custom（自定义指标）或 r_breaker。
+    提供 store 时结果写入列式存储，否则保存为 CSV。
+    """
+    print(f"正在回测 {stock_code}（{strategy}）...")
     
     # 读取数据
     df = read_stock_data(file_path)
     
     # 计算指标
-    df = calculate_custom_indicator(df)
+    df = STRATEGIES[strategy](df)
     
     # 运行回测
     results, df_with_signals = backtest_strategy(df, initial_capital, position_ratio)
     
     # 输出回测结果
-    print(f"{stock_code} 回测结果：")
-    print(f"总收益率: {results['total_return']:.2%}")
-    print(f"最大回撤: {results['max_drawdown']:.2%}")
-    print(f"夏普比率: {results['sharpe_ratio']:.2f}")
-    print(f"胜率: {results['win_rate']:.2%}")
-    print(f"最终资产: ¥{results['final_asset']:,.2f}")
+    print_results(stock_code, results)
     print()
     
     # 绘制结果图表
     plot_results(df_with_signals, stock_code)
     
     # 保存回测结果
-    output_file = f"{stock_code}_backtest_result.csv"
-    df_with_signals.to_csv(output_file, index=True)
-    print(f"回测结果已保存到 {output_file}")
+    if store is not None:
+        run_id = store.save(stock_code, strategy, df_with_signals, results,
+                            {'initial_capital': initial_capital, 'position_ratio': position_ratio})
+        print(f"回测结果已保存到 {store.root}（run_id: {run_id}）")
+    else:
+        output_file = f"{stock_code}_{strategy}_backtest_result.csv"
+        df_with_signals.to_csv(output_file, index=True)
+        print(f"回测结果已保存到 {output_file}")
+
+def run_minute_backtest(stock_code: str, path: str, start: str = None, end: str = None,
+                        initial_capital: float = 500000, position_ratio: float = 0.3,
+                        store: Optional[BacktestStore] = None):
+    """
+    分钟线日内 R-Breaker 回测：按交易日分块读取分钟线文件（或目录），
+    逐块计算信号并回测，不一次性载入全部分钟数据
+    """
+    print(f"正在回测 {stock_code}（分钟线 r_breaker）...")
+    strategy = minute_bars.IntradayRBreaker()
+    chunks = minute_bars.iter_sessions(minute_bars.read_minute_source(path, start, end))
+    results, equity = backtest_stream((strategy.update(chunk) for chunk in chunks), initial_capital, position_ratio)
+
+    print_results(stock_code, results)
+
+    if store is not None:
+        run_id = store.save(stock_code, 'minute_r_breaker', equity, results,
+                            {'initial_capital': initial_capital, 'position_ratio': position_ratio,
+                             'start': start, 'end': end})
+        print(f"每日资产已保存到 {store.root}（run_id: {run_id}）")
+    else:
+        output_file = f"{stock_code}_minute_r_breaker_backtest_result.csv"
+        equity.to_csv(output_file, index=True)
+        print(f"每日资产已保存到 {output_file}")
+    return results, equity
 
 def main():
     # 定义要回测的股票列表
     stocks_to_test = [
-        {"code": "sz300454", "file": "D:/stock_app/data/tdx/day/sz300454.csv"},
+        {"code": "sz300454", "file": "D:/stock_app/data/tdx/day/sz300454.csv", "strategy": "custom"},
+        # {"code": "sz300454", "file": "D:/stock_app/data/tdx/day/sz300454.csv", "strategy": "r_breaker"},
         # 添加更多股票...
         # {"code": "sh600000", "file": "D:/stock_app/data/tdx/day/sh600000.csv"},
     ]
@@ -182,10 +295,23 @@ def main():
     # 设置回测参数
     initial_capital = 1000000  # 100万初始资金
     position_ratio = 0.3      # 30%仓位
+
+    # 回测结果按策略和品种分区写入 Parquet，并记录到运行索引；未安装 pyarrow 时写 CSV
+    store = BacktestStore("./output/backtests") if backtest_store.pa is not None else None
     
     # 对每个股票进行回测
     for stock in stocks_to_test:
-        run_backtest(stock["code"], stock["file"], initial_capital, position_ratio)
+        run_backtest(stock["code"], stock["file"], initial_capital, position_ratio, stock.get("strategy", "custom"),
+                     store)
+
+    # 分钟线日内回测（文件或按月拆分的目录）
+    # run_minute_backtest("sz300454", "D:/stock_app/data/minute/sz300454", "2023-01-01", "2023-12-31",
+    #                     initial_capital, position_ratio, store)
+
+    # 对比已保存的回测：按指标筛选后只读取资产曲线
+    # runs = store.runs(symbol="sz300454")
+    # best = runs.sort_values('sharpe_ratio', ascending=False).index[:5]
+    # print(store.compare(best, 'total_asset'))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
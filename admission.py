@@ -0,0 +1,182 @@
+# admission.py
+"""
+请求准入控制。
+
+/analyze 等请求会调用 Tushare 和 LLM，并发不加限制时突发流量会耗尽配额并拖慢所有请求。
+AdmissionController 在进入处理前依次检查：
+- 按客户端的令牌桶限流；
+- 执行槽位（并发上限），槽位已满时进入有界优先队列，cached（数据已缓存）先于 fresh，
+  多品种报告 report 最后；
+- 队列已满或按近期处理耗时估算的排队时间超过阈值时直接拒绝，排队超过阈值也会被拒绝。
+被拒绝的请求抛出 AdmissionRejected，由调用方转换为 429 和 Retry-After。
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List
+
+# 优先级由高到低
+PRIORITIES = ('cached', 'fresh', 'report')
+
+
+class AdmissionRejected(Exception):
+    """请求未被准入，reason 为 rate_limited / queue_full / overloaded / timeout"""
+
+    def __init__(self, reason: str, retry_after: float, detail: str):
+        super().__init__(detail)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.detail = detail
+
+
+class TokenBucket:
+    """令牌桶：每秒补充 rate 个令牌，最多积攒 burst 个"""
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """取一个令牌，成功返回 0，否则返回距下一个令牌的秒数"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """
+    并发上限 + 有界优先队列 + 按客户端限流。
+
+    执行槽位释放时直接交给队列中优先级最高、到达最早的请求；
+    排队时间估算为 (前方请求数 + 1) x 平均处理耗时 / 并发上限，
+    平均处理耗时按类别做指数移动平均，未有样本时使用 initial_service_time。
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_queue: int = 32, max_wait: float = 30.0,
+                 client_rate: float = 0.2, client_burst: int = 5, initial_service_time: float = 5.0,
+                 max_clients: int = 10000):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_clients = max_clients
+        self._running = 0
+        self._waiters: List[list] = []  # 堆：[优先级, 序号, future]
+        self._sequence = itertools.count()
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._service_time = {priority: initial_service_time for priority in PRIORITIES}
+        self._queue_waits: deque = deque(maxlen=1000)
+        self.stats = {'admitted': 0, 'completed': 0, 'rate_limited': 0, 'queue_full': 0,
+                      'overloaded': 0, 'timeout': 0, 'cancelled': 0}
+
+    @asynccontextmanager
+    async def slot(self, client: str, priority: str = 'fresh') -> AsyncIterator[None]:
+        """取得执行槽位后进入，退出时释放；未被准入时抛出 AdmissionRejected"""
+        level = PRIORITIES.index(priority)
+        arrived = time.monotonic()
+        retry_after = self._bucket(client, arrived).take(arrived)
+        if retry_after:
+            self.stats['rate_limited'] += 1
+            raise AdmissionRejected('rate_limited', retry_after, f"请求过于频繁，请 {math.ceil(retry_after)} 秒后重试")
+
+        if self._running < self.max_concurrency and not self._waiters:
+            self._running += 1
+        else:
+            await self._enqueue(level)
+
+        self.stats['admitted'] += 1
+        self._queue_waits.append(time.monotonic() - arrived)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self._service_time[priority] += 0.2 * (elapsed - self._service_time[priority])
+            self.stats['completed'] += 1
+            self._release()
+
+    def estimate_wait(self, priority: str = 'fresh') -> float:
+        """按当前队列估算新请求的排队秒数"""
+        level = PRIORITIES.index(priority)
+        if self._running < self.max_concurrency and not self._waiters:
+            return 0.0
+        ahead = [PRIORITIES[entry[0]] for entry in self._waiters if entry[0] <= level]
+        work = sum(self._service_time[name] for name in ahead) + self._service_time[priority]
+        return work / self.max_concurrency
+
+    def status(self) -> Dict:
+        waits = sorted(self._queue_waits)
+        queued = {name: 0 for name in PRIORITIES}
+        for entry in self._waiters:
+            queued[PRIORITIES[entry[0]]] += 1
+        return {
+            'running': self._running,
+            'max_concurrency': self.max_concurrency,
+            'queued': queued,
+            'max_queue': self.max_queue,
+            'estimated_wait': {name: round(self.estimate_wait(name), 3) for name in PRIORITIES},
+            'service_time': {name: round(value, 3) for name, value in self._service_time.items()},
+            'queue_wait_p50': round(waits[len(waits) // 2], 3) if waits else 0.0,
+            'queue_wait_p95': round(waits[int(len(waits) * 0.95)], 3) if waits else 0.0,
+            'clients': len(self._buckets),
+            **self.stats,
+        }
+
+    async def _enqueue(self, level: int) -> None:
+        priority = PRIORITIES[level]
+        if len(self._waiters) >= self.max_queue:
+            self.stats['queue_full'] += 1
+            wait = self.estimate_wait(priority)
+            raise AdmissionRejected('queue_full', wait, f"服务繁忙，排队已满，请 {math.ceil(wait)} 秒后重试")
+        wait = self.estimate_wait(priority)
+        if wait > self.max_wait:
+            self.stats['overloaded'] += 1
+            raise AdmissionRejected('overloaded', wait, f"服务繁忙，预计需等待 {wait:.0f} 秒，请稍后重试")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [level, next(self._sequence), future]
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # 槽位已交给本请求但调用方已放弃，转交下一个
+                self._release()
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            if isinstance(e, asyncio.TimeoutError):
+                self.stats['timeout'] += 1
+                wait = self.estimate_wait(priority)
+                raise AdmissionRejected('timeout', wait, f"排队超过 {self.max_wait:.0f} 秒，请稍后重试") from None
+            self.stats['cancelled'] += 1
+            raise
+
+    def _release(self) -> None:
+        # 槽位直接交给下一个等待者，运行数不变
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._running -= 1
+
+    def _bucket(self, client: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.client_rate, self.client_burst, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket
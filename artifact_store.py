@@ -0,0 +1,280 @@
+# artifact_store.py
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+
+import aiofiles
+import aiofiles.os
+
+TMP_MAX_AGE = 3600  # 超过该秒数的临时文件视为写入中断的残留
+
+CONTENT_TYPES = {
+    '.png': 'image/png',
+    '.json': 'application/json',
+}
+
+
+@dataclass
+class Artifact:
+    """产物元数据"""
+    name: str
+    path: str
+    size: int
+    mtime: float
+    etag: str
+    content_type: str
+    digest: str
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self.mtime, usegmt=True)
+
+    @property
+    def version(self) -> str:
+        """内容版本号(SHA-1 前 16 位)，用于生成可长期缓存的地址"""
+        return self.digest[:16]
+
+
+class ArtifactStore:
+    """
+    分析产物(PNG/JSON)存储。
+
+    写入使用 aiofiles 先写临时文件再原子重命名，读取方不会看到半个文件；
+    元数据保存在内存索引中，revalidate_after 秒内的查询直接使用索引，不探测文件系统；
+    超过该时间、索引中没有该名称(可能由其他 worker 写入)或读取文件失败时才按文件状态核对；
+    内容 SHA-1 写入同目录的 .{名称}.sha1 附属文件，各 worker 对同一内容得到相同的版本号；
+    JSON 原始字节按 LRU 缓存在内存中，GET 时直接返回无需重新解析；
+    每次写入后按存活时间和总容量淘汰最旧的产物。
+    """
+
+    def __init__(self, directory: str = "./output", max_bytes: int = 512 * 2 ** 20,
+                 max_age: float = 7 * 86400, memory_bytes: int = 16 * 2 ** 20,
+                 revalidate_after: float = 5.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.memory_bytes = memory_bytes
+        self.revalidate_after = revalidate_after
+        self._index: Dict[str, Artifact] = {}
+        self._checked: Dict[str, float] = {}  # 各条目最近一次核对文件状态的时间(time.monotonic)
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_size = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def scan(self) -> None:
+        """启动时由目录内容重建索引，清理残留的临时文件"""
+        self._index.clear()
+        self._checked.clear()
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            if entry.name.endswith('.tmp'):
+                # 其他 worker 可能正在写入，只清理明显残留的临时文件
+                if now - stat.st_mtime > TMP_MAX_AGE:
+                    os.remove(entry.path)
+                continue
+            if not _valid_name(entry.name):
+                continue
+            try:
+                self._index[entry.name] = _from_stat(entry.name, entry.path, stat)
+            except FileNotFoundError:
+                continue
+            self._checked[entry.name] = time.monotonic()
+        logging.info(f"产物索引已加载: {len(self._index)} 个文件")
+
+    def get(self, name: str) -> Optional[Artifact]:
+        """
+        查询产物元数据。
+
+        多个 worker 共用同一目录，各自的内存索引可能过时：条目超过 revalidate_after 秒未核对时
+        按文件状态重新核对，其他 worker 新写入的文件补入索引，已被其他 worker 淘汰的文件从索引中移除。
+        """
+        if not _valid_name(name):
+            return None
+        artifact = self._index.get(name)
+        now = time.monotonic()
+        if artifact is not None and now - self._checked.get(name, 0.0) < self.revalidate_after:
+            return artifact
+        path = os.path.join(self.directory, name)
+        try:
+            stat = os.stat(path)
+            if artifact is None or artifact.size != stat.st_size or artifact.mtime != stat.st_mtime:
+                artifact = _from_stat(name, path, stat)
+                self._forget(name)
+        except FileNotFoundError:
+            self.invalidate(name)
+            return None
+        self._index[name] = artifact
+        self._checked[name] = now
+        return artifact
+
+    def invalidate(self, name: str) -> None:
+        """移除条目，下次查询重新核对文件状态；读取或发送文件失败时调用"""
+        self._index.pop(name, None)
+        self._checked.pop(name, None)
+        self._forget(name)
+
+    async def put_bytes(self, name: str, data: bytes) -> Artifact:
+        """原子写入产物"""
+        if not _valid_name(name):
+            raise ValueError(f"无效的产物名称: {name}")
+        path = os.path.join(self.directory, name)
+        digest = hashlib.sha1(data).hexdigest()
+        await _write_atomic(path, data)
+        # 重命名不改变修改时间，附属文件记录的大小与修改时间与刚写入的文件一致；
+        # 其间若被其他 worker 覆盖，读取方发现不一致会改为按文件内容计算
+        stat = os.stat(path)
+        await _write_atomic(_digest_path(path), f"{digest} {stat.st_size} {stat.st_mtime_ns}".encode('ascii'))
+
+        # ETag 由文件大小与修改时间决定，版本号由内容决定，各 worker 对同一文件得到相同的值
+        artifact = _from_stat(name, path, stat, digest)
+        self._index[name] = artifact
+        self._checked[name] = time.monotonic()
+        self._forget(name)
+        if artifact.content_type == 'application/json':
+            self._remember(name, data)
+        await self.evict()
+        return artifact
+
+    async def put_json(self, name: str, obj) -> Artifact:
+        data = json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return await self.put_bytes(name, data)
+
+    async def read_bytes(self, name: str) -> Optional[bytes]:
+        """读取产物内容，JSON 等小文件优先命中内存缓存"""
+        artifact = self.get(name)
+        if artifact is None:
+            return None
+        data = self._memory.get(name)
+        if data is not None:
+            self._memory.move_to_end(name)
+            return data
+        try:
+            async with aiofiles.open(artifact.path, 'rb') as f:
+                data = await f.read()
+        except FileNotFoundError:
+            # 索引过时(文件已被其他 worker 淘汰)，核对后重试一次
+            self.invalidate(name)
+            artifact = self.get(name)
+            if artifact is None:
+                return None
+            async with aiofiles.open(artifact.path, 'rb') as f:
+                data = await f.read()
+        if artifact.content_type == 'application/json':
+            self._remember(name, data)
+        return data
+
+    def headers(self, artifact: Artifact) -> Dict[str, str]:
+        return {'ETag': artifact.etag, 'Last-Modified': artifact.last_modified}
+
+    def is_not_modified(self, artifact: Artifact, request_headers: Mapping[str, str]) -> bool:
+        """按 If-None-Match / If-Modified-Since 判断客户端缓存是否仍然有效"""
+        if_none_match = request_headers.get('if-none-match')
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            return '*' in tags or artifact.etag.removeprefix('W/') in tags
+        if_modified_since = request_headers.get('if-modified-since')
+        if if_modified_since:
+            try:
+                return int(artifact.mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    async def evict(self) -> None:
+        """淘汰超过存活时间的产物，并在总容量超限时从最旧的开始删除"""
+        now = time.time()
+        by_age = sorted(self._index.values(), key=lambda a: a.mtime)
+        total = sum(a.size for a in by_age)
+        for artifact in by_age:
+            if now - artifact.mtime <= self.max_age and total <= self.max_bytes:
+                break
+            total -= artifact.size
+            self.invalidate(artifact.name)
+            try:
+                await aiofiles.os.remove(artifact.path)
+                logging.info(f"淘汰产物: {artifact.name}")
+            except FileNotFoundError:
+                pass
+            try:
+                await aiofiles.os.remove(_digest_path(artifact.path))
+            except FileNotFoundError:
+                pass
+
+    def _remember(self, name: str, data: bytes) -> None:
+        if len(data) > self.memory_bytes:
+            return
+        self._memory[name] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _forget(self, name: str) -> None:
+        data = self._memory.pop(name, None)
+        if data is not None:
+            self._memory_size -= len(data)
+
+
+def _valid_name(name: str) -> bool:
+    return bool(name) and os.path.basename(name) == name and not name.startswith('.') and not name.endswith('.tmp')
+
+
+def _from_stat(name: str, path: str, stat: os.stat_result, digest: Optional[str] = None) -> Artifact:
+    return Artifact(
+        name=name,
+        path=path,
+        size=stat.st_size,
+        mtime=stat.st_mtime,
+        etag=f'W/"{stat.st_size:x}-{stat.st_mtime_ns // 1_000_000:x}"',
+        content_type=_content_type(name),
+        digest=digest or _read_digest(path, stat),
+    )
+
+
+async def _write_atomic(path: str, data: bytes) -> None:
+    """先写临时文件再原子重命名"""
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f".{name.lstrip('.')}.{uuid.uuid4().hex}.tmp")
+    try:
+        async with aiofiles.open(tmp_path, 'wb') as f:
+            await f.write(data)
+        await aiofiles.os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            await aiofiles.os.remove(tmp_path)
+        raise
+
+
+def _digest_path(path: str) -> str:
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.sha1")
+
+
+def _read_digest(path: str, stat: os.stat_result) -> str:
+    """读取附属文件中的 SHA-1，附属文件缺失或与文件状态不一致时按文件内容计算"""
+    try:
+        with open(_digest_path(path), encoding='ascii') as f:
+            digest, size, mtime_ns = f.read().split()
+        if int(size) == stat.st_size and int(mtime_ns) == stat.st_mtime_ns:
+            return digest
+    except (OSError, ValueError):
+        pass
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def _content_type(name: str) -> str:
+    return CONTENT_TYPES.get(os.path.splitext(name)[1].lower(), 'application/octet-stream')
@@ -0,0 +1,178 @@
+# backtest_metrics.py
+"""
+回测绩效指标。
+
+资产曲线、持仓和价格既可以是一维数组（单次回测），也可以是 (回测次数, K线数) 的二维数组
+（参数扫描的多次回测），所有指标沿最后一维一次性算出，不修改输入，也不向 DataFrame 写入列。
+输入为一维时返回标量，二维时返回每次回测一个值的数组。
+"""
+from typing import Dict, Optional
+
+import numpy as np
+
+TRADE_FIELDS = ('run', 'entry', 'exit', 'direction', 'size', 'entry_price', 'exit_price',
+                'pnl', 'return', 'holding', 'closed')
+
+
+def extract_trades(position, price) -> Dict[str, np.ndarray]:
+    """
+    从逐K线持仓中提取交易记录。
+
+    持仓变化时按该K线价格成交：持仓由 0 变为非 0 开仓，由非 0 变为 0 平仓，
+    多空反手或仓位大小改变视为平掉原交易并开一笔新交易。序列结束时仍未平仓的交易
+    按最后一根K线价格计算盈亏，closed 为 False。
+
+    返回按 TRADE_FIELDS 组织的数组：run 为所属回测（一维输入时全为 0），
+    entry/exit 为开平仓K线下标，holding 为持有K线数，pnl 为 size * 价差，
+    return 为按方向计算的收益率。
+    """
+    position, price = _as_2d(position), _as_2d(price, dtype=np.float64)
+    if position.shape != price.shape:
+        raise ValueError(f"持仓与价格形状不一致: {position.shape} != {price.shape}")
+    runs, n = position.shape
+    if n == 0:
+        return make_trades([], [], np.zeros(0, dtype=position.dtype), [], [])
+
+    # 每行首尾补 0 后拼成一维，各次回测之间不会连成一笔交易
+    width = n + 2
+    padded = np.zeros((runs, width), dtype=position.dtype)
+    padded[:, 1:-1] = position
+    flat = padded.ravel()
+    changed = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    entries = changed[flat[changed] != 0]
+    exits = changed[flat[changed - 1] != 0]
+
+    run = entries // width
+    entry = entries % width - 1
+    exit_ = exits % width - 1
+    closed = exit_ < n
+    exit_ = np.minimum(exit_, n - 1)
+
+    return make_trades(entry, exit_, position[run, entry], price[run, entry], price[run, exit_], closed, run)
+
+
+def make_trades(entry, exit, size, entry_price, exit_price, closed=None, run=None) -> Dict[str, np.ndarray]:
+    """由逐笔的开平仓下标、仓位（空头为负）和价格组装交易记录，字段同 extract_trades"""
+    entry, exit = np.asarray(entry, dtype=np.int64), np.asarray(exit, dtype=np.int64)
+    size = np.asarray(size)
+    entry_price = np.asarray(entry_price, dtype=np.float64)
+    exit_price = np.asarray(exit_price, dtype=np.float64)
+    direction = np.sign(size).astype(np.int8)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = direction * (exit_price / entry_price - 1)
+    return {
+        'run': np.zeros(len(entry), dtype=np.int64) if run is None else np.asarray(run, dtype=np.int64),
+        'entry': entry,
+        'exit': exit,
+        'direction': direction,
+        'size': size,
+        'entry_price': entry_price,
+        'exit_price': exit_price,
+        'pnl': size * (exit_price - entry_price),
+        'return': returns,
+        'holding': exit - entry,
+        'closed': np.ones(len(entry), dtype=bool) if closed is None else np.asarray(closed, dtype=bool),
+    }
+
+
+def trade_metrics(trades: Dict[str, np.ndarray], runs: Optional[int] = None):
+    """
+    按回测汇总交易记录：交易次数、胜率（盈利交易占比）、盈亏比（总盈利/总亏损）、
+    平均收益率和平均持有K线数。runs 为 None 时返回单次回测的标量。
+
+    没有交易时胜率与平均值为 0、盈亏比为 NaN；只有盈利没有亏损时盈亏比为 inf。
+    """
+    run = np.asarray(trades['run'], dtype=np.int64)
+    count = runs if runs is not None else 1
+    pnl = np.asarray(trades['pnl'], dtype=np.float64)
+
+    n_trades = np.bincount(run, minlength=count)
+    wins = np.bincount(run, weights=pnl > 0, minlength=count)
+    gross_profit = np.bincount(run, weights=np.maximum(pnl, 0), minlength=count)
+    gross_loss = np.bincount(run, weights=np.maximum(-pnl, 0), minlength=count)
+    total_return = np.bincount(run, weights=trades['return'], minlength=count)
+    total_holding = np.bincount(run, weights=trades['holding'], minlength=count)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        divisor = np.maximum(n_trades, 1)
+        metrics = {
+            'trades': n_trades,
+            'win_rate': wins / divisor,
+            'profit_factor': np.where(gross_loss > 0, gross_profit / gross_loss,
+                                      np.where(gross_profit > 0, np.inf, np.nan)),
+            'avg_trade_return': total_return / divisor,
+            'avg_holding': total_holding / divisor,
+        }
+    return _unwrap(metrics, runs is None)
+
+
+def equity_metrics(equity, initial: Optional[float] = None, periods_per_year: int = 252):
+    """
+    资产曲线指标：总收益率、年化收益率、最大回撤、最长回撤持续期（K线数，含未恢复的回撤）、
+    夏普比率、索提诺比率和卡玛比率。initial 为初始资金，默认取资产曲线第一个值。
+
+    夏普与索提诺按期收益率计算并乘以 sqrt(periods_per_year)，不扣除无风险利率；
+    索提诺的下行偏差为 sqrt(mean(min(r, 0)^2))。分母为 0 时比率为 0（收益为正时为 inf）。
+    """
+    values = _as_2d(equity, dtype=np.float64)
+    single = np.ndim(equity) == 1
+    runs, n = values.shape
+    if n == 0:
+        raise ValueError("资产曲线为空")
+
+    base = values[:, 0] if initial is None else np.full(runs, float(initial))
+    returns = values[:, 1:] / values[:, :-1] - 1
+    periods = returns.shape[1]
+
+    peak = np.maximum.accumulate(values, axis=1)
+    drawdown = values / peak - 1
+    # 每根K线距最近一次创新高的K线数，其最大值即最长回撤持续期
+    index = np.arange(n)
+    last_peak = np.maximum.accumulate(np.where(values >= peak, index, 0), axis=1)
+    duration = (index - last_peak).max(axis=1)
+
+    total_return = values[:, -1] / base - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annual_return = np.where(periods > 0, (1 + total_return) ** (periods_per_year / max(periods, 1)) - 1, 0.0)
+        mean = returns.mean(axis=1) if periods else np.zeros(runs)
+        std = returns.std(axis=1, ddof=1) if periods > 1 else np.zeros(runs)
+        downside = np.sqrt((np.minimum(returns, 0) ** 2).mean(axis=1)) if periods else np.zeros(runs)
+        max_drawdown = drawdown.min(axis=1)
+        metrics = {
+            'total_return': total_return,
+            'annual_return': annual_return,
+            'max_drawdown': max_drawdown,
+            'max_drawdown_duration': duration,
+            'sharpe_ratio': _ratio(np.sqrt(periods_per_year) * mean, std),
+            'sortino_ratio': _ratio(np.sqrt(periods_per_year) * mean, downside),
+            'calmar_ratio': _ratio(annual_return, -max_drawdown),
+            'final_asset': values[:, -1],
+        }
+    return _unwrap(metrics, single)
+
+
+def summarize(equity, position, price, initial: Optional[float] = None, periods_per_year: int = 252):
+    """资产曲线指标与交易指标合并，输入形状要求同 equity_metrics 与 extract_trades"""
+    runs = None if np.ndim(equity) == 1 else np.shape(equity)[0]
+    metrics = equity_metrics(equity, initial, periods_per_year)
+    metrics.update(trade_metrics(extract_trades(position, price), runs))
+    return metrics
+
+
+def _as_2d(values, dtype=None) -> np.ndarray:
+    array = np.asarray(values, dtype=dtype)
+    if array.ndim == 1:
+        return array[None, :]
+    if array.ndim != 2:
+        raise ValueError(f"只支持一维或二维数组，收到 {array.ndim} 维")
+    return array
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return np.where(denominator > 0, numerator / denominator, np.where(numerator > 0, np.inf, 0.0))
+
+
+def _unwrap(metrics: Dict[str, np.ndarray], single: bool) -> Dict:
+    if not single:
+        return metrics
+    return {name: values[0].item() for name, values in metrics.items()}
@@ -0,0 +1,173 @@
+# backtest_store.py
+"""
+回测结果的列式存储。
+
+每次回测的逐K线结果写成一个 Parquet 文件，按策略和品种分区：
+    {root}/bars/strategy={策略}/symbol={代码}/{run_id}.parquet
+回测的参数和指标写入运行索引 {root}/runs/*.parquet，每批写入一个文件，compact 合并为一个。
+
+查询时先在索引中按品种、策略、参数或指标筛选回测，再只读取所需回测的所需列，
+不必像逐次回测的宽 CSV 那样整份解析。
+"""
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 为可选依赖，只有使用 BacktestStore 时需要
+    pa = None
+
+INDEX_COLUMNS = ('run_id', 'symbol', 'strategy', 'created', 'start', 'end', 'rows', 'params')
+
+
+@dataclass
+class BacktestRun:
+    """一次回测的结果：逐K线 DataFrame（以时间为索引）、指标字典和参数"""
+    symbol: str
+    strategy: str
+    frame: pd.DataFrame
+    results: Dict[str, Any]
+    params: Dict[str, Any] = field(default_factory=dict)
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+
+
+class BacktestStore:
+    """
+    回测结果存储。
+
+    运行索引的列为 INDEX_COLUMNS、param_ 前缀的各参数和全部数值指标；
+    逐K线数据的时间索引存为 date 列，整数信号列压缩为最小整数类型。
+    """
+
+    def __init__(self, root: str = "./output/backtests", compression: str = 'zstd'):
+        if pa is None:
+            raise RuntimeError("回测结果存储需要安装 pyarrow")
+        self.root = root
+        self.compression = compression
+        os.makedirs(os.path.join(root, 'bars'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'runs'), exist_ok=True)
+
+    def save(self, symbol: str, strategy: str, frame: pd.DataFrame, results: Dict[str, Any],
+             params: Optional[Dict[str, Any]] = None) -> str:
+        """保存一次回测，返回 run_id"""
+        return self.save_many([BacktestRun(symbol, strategy, frame, results, params or {})])[0]
+
+    def save_many(self, runs: Iterable[BacktestRun]) -> List[str]:
+        """批量保存（如一次参数扫描），所有回测共用一个索引文件"""
+        records = []
+        for run in runs:
+            self._write(self._bars_path(run.strategy, run.symbol, run.run_id), self._bars_table(run))
+            records.append(self._record(run))
+        if records:
+            index = pd.DataFrame.from_records(records)
+            self._write(os.path.join(self.root, 'runs', f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"),
+                        pa.Table.from_pandas(index, preserve_index=False))
+        return [record['run_id'] for record in records]
+
+    def runs(self, symbol: Optional[str] = None, strategy: Optional[str] = None) -> pd.DataFrame:
+        """读取运行索引（以 run_id 为索引），可按品种和策略筛选；参数与指标的筛选直接对返回的 DataFrame 操作"""
+        paths = self._index_paths()
+        if not paths:
+            return pd.DataFrame(columns=INDEX_COLUMNS[1:], index=pd.Index([], name='run_id'))
+        index = pd.concat([pq.read_table(path).to_pandas() for path in paths], ignore_index=True)
+        if symbol is not None:
+            index = index[index['symbol'] == symbol]
+        if strategy is not None:
+            index = index[index['strategy'] == strategy]
+        return index.sort_values('created', kind='stable').set_index('run_id')
+
+    def load(self, run_ids: Sequence[str], columns: Optional[Sequence[str]] = None,
+             index: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        读取若干回测的逐K线数据，只读取 columns 指定的列（默认全部）。
+
+        返回长表：以时间为索引，run_id 列标明所属回测。index 为已读取的运行索引，可省去重复读取。
+        """
+        index = self.runs() if index is None else index
+        missing = [run_id for run_id in run_ids if run_id not in index.index]
+        if missing:
+            raise KeyError(f"未找到回测: {missing}")
+        selected = index.loc[list(run_ids)]
+        paths = [self._bars_path(strategy, symbol, run_id)
+                 for run_id, strategy, symbol in zip(selected.index, selected['strategy'], selected['symbol'])]
+        read_columns = None if columns is None else ['run_id', 'date'] + [c for c in columns if c not in ('run_id', 'date')]
+        table = ds.dataset(paths, format='parquet').to_table(columns=read_columns)
+        return table.to_pandas().set_index('date')
+
+    def compare(self, run_ids: Sequence[str], column: str = 'total_asset',
+                index: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """把若干回测的同一列对齐为宽表（时间 x run_id），用于对比资产曲线等"""
+        long = self.load(run_ids, [column], index)
+        return long.reset_index().pivot(index='date', columns='run_id', values=column)[list(run_ids)]
+
+    def compact(self) -> None:
+        """把多个索引文件合并为一个，减少大量小批次写入后的读取开销"""
+        paths = self._index_paths()
+        if len(paths) <= 1:
+            return
+        index = self.runs().reset_index()
+        self._write(os.path.join(self.root, 'runs', f"{time.strftime('%Y%m%d%H%M%S')}-compact.parquet"),
+                    pa.Table.from_pandas(index, preserve_index=False))
+        for path in paths:
+            os.remove(path)
+
+    def _bars_table(self, run: BacktestRun) -> "pa.Table":
+        frame = run.frame.copy()
+        frame.index = frame.index.rename('date')
+        frame = frame.reset_index()
+        for name in frame.columns:
+            if pd.api.types.is_integer_dtype(frame[name]) or pd.api.types.is_bool_dtype(frame[name]):
+                frame[name] = pd.to_numeric(frame[name], downcast='integer')
+        frame.insert(0, 'run_id', run.run_id)
+        return pa.Table.from_pandas(frame, preserve_index=False)
+
+    @staticmethod
+    def _record(run: BacktestRun) -> Dict[str, Any]:
+        record = {
+            'run_id': run.run_id,
+            'symbol': run.symbol,
+            'strategy': run.strategy,
+            'created': pd.Timestamp.now(),
+            'start': run.frame.index[0] if len(run.frame) else pd.NaT,
+            'end': run.frame.index[-1] if len(run.frame) else pd.NaT,
+            'rows': len(run.frame),
+            'params': json.dumps(run.params, ensure_ascii=False, default=str),
+        }
+        for name, value in run.params.items():
+            if isinstance(value, (int, float, str, bool, np.number)):
+                record[f"param_{name}"] = value
+        for name, value in run.results.items():
+            if isinstance(value, (int, float, np.number)):
+                record[name] = float(value)
+        return record
+
+    def _bars_path(self, strategy: str, symbol: str, run_id: str) -> str:
+        return os.path.join(self.root, 'bars', f"strategy={strategy}", f"symbol={symbol}", f"{run_id}.parquet")
+
+    def _index_paths(self) -> List[str]:
+        directory = os.path.join(self.root, 'runs')
+        return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.parquet'))
+
+    def _write(self, path: str, table: "pa.Table") -> None:
+        """先写临时文件再原子重命名，读取方不会看到半个文件"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            floats = [f.name for f in table.schema if pa.types.is_floating(f.type)]
+            # 浮点列不做字典编码、按字节拆分后再压缩，体积明显更小
+            pq.write_table(table, tmp_path, compression=self.compression, use_byte_stream_split=floats,
+                           use_dictionary=[name for name in table.column_names if name not in floats])
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -0,0 +1,125 @@
+# bars.py
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+# 成交量/成交额/持仓量数值较大，float32 精度不足，始终保留 float64
+WIDE_COLUMNS = ('volume', 'amount', 'oi', 'oi_chg')
+# 与时间索引重复的字符串字段，转换时丢弃
+REDUNDANT_COLUMNS = ('trade_date',)
+
+
+class Bars:
+    """
+    紧凑的只读K线容器。
+
+    时间戳保存为 int64 纳秒时间戳，价格类字段可选 float32，字符串字段保存为分类编码。
+    所有数组均设为只读，数据获取、指标计算、提示词生成和绘图各阶段共享同一份数组，
+    with_columns 只新增数组而不复制已有字段。
+    """
+
+    __slots__ = ('timestamps', 'float_dtype', '_columns', '_categories', '_index')
+
+    def __init__(self, timestamps: np.ndarray, columns: Dict[str, np.ndarray],
+                 categories: Optional[Dict[str, pd.Index]] = None,
+                 float_dtype: Union[str, np.dtype] = np.float64):
+        self.timestamps = _readonly(np.asarray(timestamps, dtype=np.int64))
+        self.float_dtype = np.dtype(float_dtype)
+        self._columns = {name: _readonly(values) for name, values in columns.items()}
+        self._categories = dict(categories or {})
+        self._index = None
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, float_dtype: Union[str, np.dtype] = np.float32) -> 'Bars':
+        """由以时间为索引的 DataFrame 构建"""
+        float_dtype = np.dtype(float_dtype)
+        columns, categories = {}, {}
+        for name in df.columns:
+            if name in REDUNDANT_COLUMNS:
+                continue
+            series = df[name]
+            if pd.api.types.is_bool_dtype(series):
+                columns[name] = series.to_numpy(dtype=bool)
+            elif pd.api.types.is_numeric_dtype(series):
+                dtype = np.float64 if name in WIDE_COLUMNS else float_dtype
+                columns[name] = series.to_numpy(dtype=dtype)
+            else:
+                codes, uniques = pd.factorize(series)
+                columns[name] = codes.astype(np.int32)
+                categories[name] = uniques
+        index = pd.DatetimeIndex(df.index)
+        if hasattr(index, 'as_unit'):  # pandas>=2.0 的索引可能不是纳秒精度
+            index = index.as_unit('ns')
+        return cls(index.asi8, columns, categories, float_dtype)
+
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        if self._index is None:
+            self._index = pd.DatetimeIndex(self.timestamps.view('datetime64[ns]'), name='date')
+        return self._index
+
+    @property
+    def columns(self) -> list:
+        return list(self._columns)
+
+    @property
+    def categories(self) -> Dict[str, pd.Index]:
+        return dict(self._categories)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.timestamps) == 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + sum(values.nbytes for values in self._columns.values())
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._columns
+
+    def __getitem__(self, name: str) -> pd.Series:
+        """按列名返回共享底层数组的 Series"""
+        values = self._columns[name]
+        if name in self._categories:
+            values = pd.Categorical.from_codes(values, categories=self._categories[name])
+        return pd.Series(values, index=self.index, name=name, copy=False)
+
+    def values(self, name: str) -> np.ndarray:
+        """返回只读的原始数组"""
+        return self._columns[name]
+
+    def with_columns(self, **arrays: Union[np.ndarray, pd.Series]) -> 'Bars':
+        """返回新增若干列后的新容器，已有数组不复制"""
+        columns = dict(self._columns)
+        for name, values in arrays.items():
+            values = values.to_numpy() if isinstance(values, pd.Series) else np.asarray(values)
+            if values.dtype.kind == 'f' and name not in WIDE_COLUMNS:
+                values = values.astype(self.float_dtype, copy=False)
+            columns[name] = values
+        bars = Bars(self.timestamps, columns, self._categories, self.float_dtype)
+        bars._index = self._index
+        return bars
+
+    def between(self, start: int, end: int) -> 'Bars':
+        """返回时间戳位于 [start, end) 的部分，各数组为原数组的切片，不复制"""
+        lo, hi = np.searchsorted(self.timestamps, [start, end])
+        if lo == 0 and hi == len(self.timestamps):
+            return self
+        columns = {name: values[lo:hi] for name, values in self._columns.items()}
+        return Bars(self.timestamps[lo:hi], columns, self._categories, self.float_dtype)
+
+    def to_frame(self, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        columns = self.columns if columns is None else list(columns)
+        return pd.DataFrame({name: self[name] for name in columns}, index=self.index)
+
+
+def _readonly(values: np.ndarray) -> np.ndarray:
+    values = np.asarray(values)
+    if values.flags.writeable:
+        values = values.view()
+        values.flags.writeable = False
+    return values
@@ -0,0 +1,141 @@
+# benchmarks/bench_admission.py
+"""
+本地负载发生器：对比有无准入控制时突发流量下的延迟与拒绝情况。
+
+后端用容量固定的模拟服务代替 Tushare + LLM（同时最多处理 --capacity 个请求，
+数据已缓存的请求耗时 --cached 秒，其余 --fresh 秒）。按固定速率开环发出请求，
+其中 --abusive 比例来自同一个客户端，其余分散在 --clients 个客户端，--cached-share 比例为缓存命中请求。
+
+unbounded: 请求直接进入后端，超出容量的请求在后端排队；
+admitted:  经 main.admitted（AdmissionController）准入，超出阈值的请求立即得到 429 + Retry-After。
+
+用法: python benchmarks/bench_admission.py [--rate 60] [--duration 5]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def run_load(client, path: str, args, app_main) -> None:
+    rng = random.Random(0)
+    results = []
+    max_queued = 0
+
+    async def one(client_name: str, cached: bool):
+        started = time.perf_counter()
+        response = await client.post(path, json={'cached': cached}, headers={'X-Client-Id': client_name})
+        body = response.json()
+        results.append((response.status_code, 'cached' if cached else 'fresh', time.perf_counter() - started,
+                        body.get('reason'), response.headers.get('retry-after')))
+
+    async def monitor():
+        nonlocal max_queued
+        while True:
+            if app_main.admission is not None:
+                max_queued = max(max_queued, sum(app_main.admission.status()['queued'].values()))
+            await asyncio.sleep(0.02)
+
+    watcher = asyncio.create_task(monitor())
+    tasks = []
+    total = int(args.rate * args.duration)
+    started = time.perf_counter()
+    for i in range(total):
+        delay = started + i / args.rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        name = 'abusive' if rng.random() < args.abusive else f"client-{rng.randrange(args.clients)}"
+        tasks.append(asyncio.create_task(one(name, rng.random() < args.cached_share)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    watcher.cancel()
+
+    ok = [r for r in results if r[0] == 200]
+    rejected = [r for r in results if r[0] == 429]
+    reasons = Counter(r[3] for r in rejected)
+    print(f"{path.rsplit('/', 1)[-1]}: {len(results)} 个请求, 成功 {len(ok)} ({len(ok) / elapsed:.1f}/s), "
+          f"429 {len(rejected)} {dict(reasons)}, 最大排队 {max_queued}")
+    for name in ('cached', 'fresh'):
+        latencies = [r[2] for r in ok if r[1] == name]
+        print(f"  成功 {name:6s} {len(latencies):4d} 个: p50 {percentile(latencies, 0.5) * 1000:6.0f}ms, "
+              f"p95 {percentile(latencies, 0.95) * 1000:6.0f}ms, p99 {percentile(latencies, 0.99) * 1000:6.0f}ms")
+    if rejected:
+        retry_after = sorted({int(r[4]) for r in rejected if r[4]})
+        print(f"  429 响应 p95 {percentile([r[2] for r in rejected], 0.95) * 1000:.0f}ms, Retry-After 取值 {retry_after}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rate', type=float, default=60, help='每秒发出的请求数')
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--capacity', type=int, default=4)
+    parser.add_argument('--fresh', type=float, default=0.2)
+    parser.add_argument('--cached', type=float, default=0.05)
+    parser.add_argument('--cached-share', type=float, default=0.3)
+    parser.add_argument('--abusive', type=float, default=0.3)
+    parser.add_argument('--clients', type=int, default=40)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    shutil.copytree(os.path.join(ROOT, 'static'), os.path.join(workdir, 'static'))
+    os.chdir(workdir)
+    import httpx
+    from fastapi import Request
+
+    import main as app_main
+    from config import Settings
+
+    app_main.settings = Settings(TUSHARE_TOKEN='-', OPENAI_API_KEY='-', API_URL='-', ADMISSION_CLIENT_HEADER='X-Client-Id',
+                                 ADMISSION_MAX_CONCURRENCY=args.capacity, ADMISSION_MAX_QUEUE=4 * args.capacity,
+                                 ADMISSION_MAX_WAIT=1.0, ADMISSION_CLIENT_RATE=2.0, ADMISSION_CLIENT_BURST=5)
+    app_main.readiness['data'] = True
+    logging.getLogger().setLevel(logging.ERROR)
+    logging.getLogger('httpx').setLevel(logging.ERROR)
+    backend = {}
+
+    async def work(cached: bool):
+        async with backend['slots']:
+            await asyncio.sleep(args.cached if cached else args.fresh)
+        return {'ok': True}
+
+    @app_main.app.post('/bench/unbounded')
+    async def unbounded(request: Request):
+        return await work((await request.json())['cached'])
+
+    @app_main.app.post('/bench/admitted')
+    async def admitted(request: Request):
+        cached = (await request.json())['cached']
+        return await app_main.admitted(request, 'cached' if cached else 'fresh', lambda: work(cached))
+
+    async def run():
+        backend['slots'] = asyncio.Semaphore(args.capacity)
+        transport = httpx.ASGITransport(app=app_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+            print(f"{args.rate:.0f} 请求/s x {args.duration:.0f}s, 后端容量 {args.capacity}, "
+                  f"单客户端占比 {args.abusive:.0%}, 缓存命中占比 {args.cached_share:.0%}")
+            await run_load(client, '/bench/unbounded', args, app_main)
+            await run_load(client, '/bench/admitted', args, app_main)
+            print(f"  指标: {app_main.admission.status()}")
+
+    asyncio.run(run())
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/bench_bars.py
+"""
+对比 DataFrame 与紧凑 Bars 在并发请求下的峰值内存(RSS)。
+
+每种模式在独立子进程中运行，用多个线程同时处理长区间的合成日线，
+各线程持有计算结果直到全部完成，模拟并发请求期间的内存占用。
+
+用法: python benchmarks/bench_bars.py [--workers 16] [--rows 5000]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import threading
+import types
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_frame(rows: int, seed: int) -> pd.DataFrame:
+    """生成与 Tushare 日线结构一致的合成数据"""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range('2000-01-03', periods=rows, name='date')
+    close = 100 + rng.standard_normal(rows).cumsum()
+    return pd.DataFrame({
+        'ts_code': '000001.SZ',
+        'trade_date': index.strftime('%Y%m%d'),
+        'open': close + rng.standard_normal(rows) * 0.1,
+        'high': close + 1,
+        'low': close - 1,
+        'close': close,
+        'pre_close': np.roll(close, 1),
+        'change': rng.standard_normal(rows),
+        'pct_chg': rng.standard_normal(rows),
+        'volume': rng.integers(10 ** 6, 10 ** 8, rows).astype(float),
+        'amount': rng.integers(10 ** 8, 10 ** 10, rows).astype(float),
+    }, index=index)
+
+
+def legacy_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """改造前 calculate_indicators 的列布局：全部 float64 且保留中间列"""
+    df['Prev_Close'] = df['close'].shift(1)
+    df['Pivot'] = (df['high'] + df['low'] + df['Prev_Close']) / 3
+    for name, k in (('Break_Support', -0.25), ('Break_Resistance', 0.25),
+                    ('Scrutiny_Buy', 0.1), ('Scrutiny_Sell', -0.1)):
+        df[name] = df['Pivot'] + k * (df['high'] - df['low'])
+    df['EMA12'] = df['close'].ewm(span=12, adjust=False).mean()
+    df['EMA26'] = df['close'].ewm(span=26, adjust=False).mean()
+    df['DIF'] = df['EMA12'] - df['EMA26']
+    df['DEA'] = df['DIF'].ewm(span=9, adjust=False).mean()
+    df['MACD'] = (df['DIF'] - df['DEA']) * 2
+    df['MIDA'] = df['close'].rolling(window=20).mean()
+    df['UPPERA'] = df['MIDA'] + 2 * df['close'].rolling(window=20).std()
+    df['LOWERA'] = df['MIDA'] - 2 * df['close'].rolling(window=20).std()
+    df['RSI'] = 100 - (100 / (1 + df['close'].diff().apply(lambda x: max(x, 0)).rolling(window=14).mean() /
+                             df['close'].diff().apply(lambda x: max(-x, 0)).rolling(window=14).mean()))
+    df['H-L'] = df['high'] - df['low']
+    df['H-Cprev'] = abs(df['high'] - df['close'].shift(1))
+    df['L-Cprev'] = abs(df['low'] - df['close'].shift(1))
+    df['TR'] = df[['H-L', 'H-Cprev', 'L-Cprev']].max(axis=1)
+    df['ATR'] = df['TR'].rolling(14).mean()
+    df['channel_upper'] = df['MIDA'].rolling(window=15).max()
+    df['channel_lower'] = df['MIDA'].rolling(window=15).min()
+    df['MA_volume'] = df['volume'].rolling(window=20).mean()
+    return df
+
+
+def run_mode(mode: str, workers: int, rows: int) -> None:
+    from analysis_service import AnalysisService
+    from bars import Bars
+    import rolling
+
+    rolling.warm_up()  # 内核编译占用的内存不计入结果
+
+    service = AnalysisService(types.SimpleNamespace(BAR_FLOAT_DTYPE='float32'), llm_client=object())
+    results = [None] * workers
+    barrier = threading.Barrier(workers)
+
+    def work(i: int) -> None:
+        df = make_frame(rows, i)
+        if mode == 'frame':
+            results[i] = legacy_indicators(df)
+        else:
+            bars = Bars.from_frame(df, 'float32')
+            del df
+            results[i] = service.calculate_indicators(bars)
+        barrier.wait()
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    held = sum(r.memory_usage(deep=True).sum() if isinstance(r, pd.DataFrame) else r.nbytes for r in results)
+    print(f"{mode}: 峰值RSS增量 {(peak - baseline) / 1024:.1f} MB, 结果占用 {held / 2 ** 20:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--mode', choices=['frame', 'bars'])
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.workers, args.rows)
+        return
+    for mode in ('frame', 'bars'):
+        subprocess.run([sys.executable, __file__, '--mode', mode,
+                        '--workers', str(args.workers), '--rows', str(args.rows)], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# benchmarks/bench_batch.py
+"""
+对比多品种报告逐个请求与批量请求的提示词 token 数和总耗时。
+
+使用本地桩服务（每次请求固定延迟），桩服务按提示词中的 "### 代码" 分节回复。
+用法: python benchmarks/bench_batch.py [--symbols 8] [--latency 0.5]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from analysis_service import AnalysisService  # noqa: E402
+from bars import Bars  # noqa: E402
+from bench_bars import make_frame  # noqa: E402
+from bench_llm import StubLLMServer  # noqa: E402
+from llm_client import LLMClient  # noqa: E402
+from prompt_builder import PromptBuilder, estimate_tokens  # noqa: E402
+
+
+def sectioned_reply(prompt: str) -> str:
+    symbols = re.findall(r'^### (\S+)$', prompt, flags=re.M)
+    if not symbols:
+        return "单品种分析"
+    return "\n".join(f"### {symbol}\n{symbol} 的分析" for symbol in symbols)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.5)
+    args = parser.parse_args()
+
+    stub = StubLLMServer("stub", latency=args.latency, reply=sectioned_reply)
+    settings = types.SimpleNamespace(PROMPT_VERBOSITY='standard', PROMPT_TOKEN_BUDGET=600,
+                                     LLM_BATCH_SIZE=args.symbols)
+    service = AnalysisService(settings, LLMClient([stub.provider()]))
+    start, end = '2023-01-01', '2023-12-31'
+    items = [(f"{600000 + i}.SH", service.calculate_indicators(Bars.from_frame(make_frame(250, i))))
+             for i in range(args.symbols)]
+
+    builder = PromptBuilder(settings.PROMPT_VERBOSITY, settings.PROMPT_TOKEN_BUDGET)
+    started = time.perf_counter()
+    tokens = 0
+    for symbol, bars in items:
+        prompt = builder.build(service.collect_metrics(bars), symbol, start, end)
+        tokens += estimate_tokens(prompt)
+        service.get_gpt_analysis(prompt)
+    print(f"逐个请求: {args.symbols} 次, 约 {tokens} tokens, {time.perf_counter() - started:.2f}s")
+
+    stub.requests = 0
+    started = time.perf_counter()
+    metrics = [(symbol, service.collect_metrics(bars)) for symbol, bars in items]
+    tokens = estimate_tokens(PromptBuilder(settings.PROMPT_VERBOSITY).build_batch(metrics, start, end))
+    results = service.batch_narrate(items, start, end)
+    print(f"批量请求: {stub.requests} 次, 约 {tokens} tokens, {time.perf_counter() - started:.2f}s, "
+          f"解析出 {len(results)}/{args.symbols} 个品种")
+
+
+if __name__ == "__main__":
+    main()
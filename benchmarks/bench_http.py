@@ -0,0 +1,74 @@
+# benchmarks/bench_http.py
+"""
+模拟浏览器反复查看同一分析结果，统计请求数与传输字节数。
+
+before: 客户端不发送条件请求、不声明压缩，等同于改造前每次完整下载；
+after:  客户端遵守 Cache-Control（immutable 地址直接命中本地缓存）、
+        使用 ETag 条件请求并声明 gzip/br 压缩。
+用法: python benchmarks/bench_http.py [--views 20]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class BrowserCache:
+    """极简浏览器缓存：immutable 响应直接复用，其余按 ETag 重新验证"""
+
+    def __init__(self, client, enabled: bool):
+        self.client = client
+        self.enabled = enabled
+        self.entries = {}
+        self.requests = 0
+        self.bytes = 0
+
+    def get(self, url: str):
+        entry = self.entries.get(url)
+        if self.enabled and entry and 'immutable' in entry.get('cache-control', ''):
+            return
+        headers = {'Accept-Encoding': 'br, gzip'} if self.enabled else {'Accept-Encoding': 'identity'}
+        if self.enabled and entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        response = self.client.get(url, headers=headers)
+        self.requests += 1
+        self.bytes += int(response.headers.get('content-length', len(response.content)))
+        if response.status_code == 200:
+            self.entries[url] = dict(response.headers)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--views', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    shutil.copytree(os.path.join(ROOT, 'static'), os.path.join(workdir, 'static'))
+    os.chdir(workdir)
+    import main as app_main
+    from fastapi.testclient import TestClient
+
+    with TestClient(app_main.app) as client:
+        png = open(os.path.join(ROOT, 'static', 'images', '300454.png'), 'rb').read()
+        analysis = '技术分析结论。' * 400
+        image = asyncio.run(app_main.artifact_store.put_bytes('DEMO_2024-01-01_2024-06-30.png', png))
+        report = asyncio.run(app_main.save_json_analysis('DEMO', '2024-01-01', '2024-06-30', analysis))
+        urls = ['/', app_main.versioned_url('/get_image/DEMO_2024-01-01_2024-06-30.png', image),
+                app_main.versioned_url('/get_json/DEMO_2024-01-01_2024-06-30', report)]
+
+        for mode, enabled in (('before', False), ('after', True)):
+            browser = BrowserCache(client, enabled)
+            for _ in range(args.views):
+                for url in urls:
+                    browser.get(url)
+            print(f"{mode}: {browser.requests} 次请求, {browser.bytes / 1024:.1f} KB")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
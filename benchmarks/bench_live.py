@@ -0,0 +1,97 @@
+# benchmarks/bench_live.py
+"""
+实时推送的正确性与扇出能力。
+
+1. 增量计算与整段向量化计算比较：日内 R-Breaker 持仓与 r_breaker.intraday_signals 一致，
+   EMA/DEA/RSI 与 calculate_indicators 一致；
+2. 多个品种、每个品种数千个订阅者时，测量每秒处理的K线数、分发的消息数，
+   并确认每个品种只计算一次（处理的K线数等于行情K线数，与订阅者数量无关）。
+
+用法: python benchmarks/bench_live.py [--symbols 4] [--subscribers 2000] [--days 5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import types
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import minute_bars  # noqa: E402
+import r_breaker  # noqa: E402
+from analysis_service import AnalysisService  # noqa: E402
+from bars import Bars  # noqa: E402
+from live_feed import Bar, IncrementalSignals, LiveHub, StubFeed  # noqa: E402
+
+
+def check_parity(days: int) -> None:
+    frame = pd.concat(minute_bars.stub_minute_feed('2024-01-02', str(pd.Timestamp('2024-01-02') + pd.offsets.BDay(days))))
+    signals = IncrementalSignals()
+    positions, ema12, dea, rsi = [], [], [], []
+    for row in zip(frame.index, frame['open'], frame['high'], frame['low'], frame['close'], frame['volume']):
+        signals.update(Bar(*row))
+        positions.append(signals.position)
+        ema12.append(signals.ema12)
+        dea.append(signals.dea)
+        rsi.append(signals._rsi())
+
+    _, _, expected = r_breaker.intraday_signals(frame['high'], frame['low'], frame['close'], frame.index.normalize().asi8)
+    assert (np.array(positions) == expected).all(), "增量持仓与向量化结果不一致"
+    service = AnalysisService(types.SimpleNamespace(BAR_FLOAT_DTYPE='float64'), llm_client=object())
+    indicators = service.calculate_indicators(Bars.from_frame(frame, 'float64'))
+    for name, values in (('EMA12', ema12), ('DEA', dea), ('RSI', rsi)):
+        assert np.allclose(values, indicators.values(name), rtol=1e-9, equal_nan=True), name
+    print(f"增量计算与向量化一致: {len(frame)} 根K线, 持仓变化 {int((np.diff(expected) != 0).sum())} 次")
+
+
+async def fan_out(symbols: int, subscribers: int, bars_per_symbol: int) -> None:
+    hub = LiveHub(StubFeed(interval=0), queue_size=1024)
+    received = 0
+
+    async def consume(queue: asyncio.Queue) -> None:
+        nonlocal received
+        while True:
+            await queue.get()
+            received += 1
+
+    names = [f"{600000 + i}.SH" for i in range(symbols)]
+    queues = []
+    for name in names:
+        for _ in range(subscribers):
+            queue = hub.new_queue()
+            hub.subscribe(name, queue)
+            queues.append(queue)
+    consumers = [asyncio.create_task(consume(queue)) for queue in queues]
+
+    started = time.perf_counter()
+    while hub.stats['bars'] < symbols * bars_per_symbol:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    for name, queue in zip(np.repeat(names, subscribers), queues):
+        hub.unsubscribe(name, queue)
+    for consumer in consumers:
+        consumer.cancel()
+
+    stats = hub.stats
+    print(f"{symbols} 个品种 x {subscribers} 个订阅者: {stats['bars']} 根K线 ({stats['bars'] / elapsed:,.0f}/s), "
+          f"{stats['events']} 个事件, 分发 {stats['deliveries']:,} 条 ({stats['deliveries'] / elapsed:,.0f}/s), "
+          f"消费 {received:,} 条, 丢弃 {stats['dropped']}, 耗时 {elapsed:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=4)
+    parser.add_argument('--subscribers', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=5)
+    args = parser.parse_args()
+
+    check_parity(20)
+    asyncio.run(fan_out(args.symbols, args.subscribers, args.days * 240))
+
+
+if __name__ == "__main__":
+    main()
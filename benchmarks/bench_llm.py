@@ -0,0 +1,99 @@
+# benchmarks/bench_llm.py
+"""
+用本地 OpenAI 兼容桩服务验证 LLMClient 的超时、故障转移、对冲和熔断行为。
+
+桩服务可注入固定延迟和失败率，每个场景打印耗时、结果来源和各服务的熔断状态。
+用法: python benchmarks/bench_llm.py
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_client import LLMClient, LLMError, LLMProvider  # noqa: E402
+
+
+class StubLLMServer:
+    """注入延迟与失败的 OpenAI 兼容桩服务"""
+
+    def __init__(self, name: str, latency: float = 0.0, fail_rate: float = 0.0, reply=None):
+        self.name = name
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.reply = reply or (lambda prompt: f"来自 {name}")
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                stub.requests += 1
+                time.sleep(stub.latency)
+                if random.random() < stub.fail_rate:
+                    body, status = b'{"error": "injected"}', 500
+                else:
+                    body = json.dumps({"choices": [{"message": {"content": stub.reply(payload["messages"][0]["content"])}}]},
+                                      ensure_ascii=False).encode("utf-8")
+                    status = 200
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/chat/completions"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def provider(self, timeout: float = 5.0, max_concurrency: int = 4) -> LLMProvider:
+        return LLMProvider(self.name, self.url, "stub", "stub-model", max_concurrency, timeout,
+                           breaker_threshold=3, breaker_cooldown=2.0)
+
+
+def run(title: str, client: LLMClient, calls: int = 1) -> None:
+    for _ in range(calls):
+        started = time.perf_counter()
+        try:
+            result = client.complete("ping")
+        except LLMError as e:
+            result = f"失败 {e}"
+        print(f"{title}: {time.perf_counter() - started:.2f}s -> {result} | {client.status()}")
+
+
+def main():
+    healthy = StubLLMServer("healthy", latency=0.05)
+
+    failing = StubLLMServer("failing", fail_rate=1.0)
+    run("故障转移+熔断", LLMClient([failing.provider(), healthy.provider()]), calls=5)
+    print(f"  failing 实际收到 {failing.requests} 次请求（熔断后不再调用）")
+
+    hanging = StubLLMServer("hanging", latency=3.0)
+    run("超时后转移", LLMClient([hanging.provider(timeout=0.5), healthy.provider()]))
+
+    slow = StubLLMServer("slow", latency=2.0)
+    run("对冲请求", LLMClient([slow.provider(), healthy.provider()], hedge_delay=0.3))
+
+    burst = StubLLMServer("burst", latency=0.2)
+    client = LLMClient([burst.provider(max_concurrency=2)])
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client.complete, args=("ping",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"并发上限2、8个请求: {time.perf_counter() - started:.2f}s（约 4 × 0.2s）")
+
+
+if __name__ == "__main__":
+    main()
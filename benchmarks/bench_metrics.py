@@ -0,0 +1,142 @@
+# benchmarks/bench_metrics.py
+"""
+校验并对比回测指标的向量化实现：
+
+1. backtest_strategy 改写前后资产曲线、收益率、最大回撤、夏普比率一致，且不再写入
+   strategy_return/drawdown 列；逐笔交易盈亏之和等于资产变化。
+2. 参数扫描：对 R-Breaker 的 (f1, f2, f3) 网格生成多次回测的持仓和资产曲线，
+   backtest_metrics.summarize 一次算出全部指标，与逐次回测的 pandas/循环实现对照。
+
+用法: python benchmarks/bench_metrics.py [--rows 2000] [--runs 2000]
+"""
+import argparse
+import importlib
+import itertools
+import os
+import subprocess
+import sys
+import time
+import types
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import backtest_metrics  # noqa: E402
+import r_breaker  # noqa: E402
+import rolling  # noqa: E402
+from bench_bars import make_frame  # noqa: E402
+
+backtest = importlib.import_module('RB回测')
+
+
+def baseline_backtest():
+    """载入改写前的 backtest_strategy（引入 backtest_metrics.py 之前的版本）作为对照"""
+    added = subprocess.run(['git', 'log', '--diff-filter=A', '--format=%H', '--', 'backtest_metrics.py'],
+                           cwd=ROOT, capture_output=True, check=True, text=True).stdout.split()[-1]
+    source = subprocess.run(['git', 'show', f'{added}^:RB回测.py'], cwd=ROOT, capture_output=True, check=True).stdout
+    # 原实现先建整数列再写入浮点数，新版 pandas 不再自动升级类型，这里改为浮点初值
+    source = source.decode('utf-8').replace("df['stock_holding'] = 0", "df['stock_holding'] = 0.0")
+    module = types.ModuleType('baseline_backtest')
+    exec(compile(source, 'baseline_backtest', 'exec'), module.__dict__)
+    return module.backtest_strategy
+
+
+def reference_metrics(equity: np.ndarray, position: np.ndarray, price: np.ndarray) -> dict:
+    """单次回测的逐项实现：pandas 计算资产曲线指标，循环提取交易"""
+    series = pd.Series(equity)
+    returns = series.pct_change().dropna()
+    peak = series.cummax()
+    underwater, longest = 0, 0
+    for value, high in zip(series, peak):
+        underwater = underwater + 1 if value < high else 0
+        longest = max(longest, underwater)
+    downside = np.sqrt((returns.clip(upper=0) ** 2).mean())
+
+    pnl, current, entry = [], 0, 0
+    for i, size in enumerate(list(position) + [0]):
+        if size != current:
+            if current != 0:
+                pnl.append(current * (price[min(i, len(price) - 1)] - price[entry]))
+            if size != 0:
+                entry = i
+            current = size
+    pnl = np.array(pnl)
+    losses = -pnl[pnl < 0].sum()
+    return {
+        'max_drawdown': (series / peak - 1).min(),
+        'max_drawdown_duration': longest,
+        'sharpe_ratio': np.sqrt(252) * returns.mean() / returns.std() if returns.std() > 0 else 0.0,
+        'sortino_ratio': np.sqrt(252) * returns.mean() / downside if downside > 0 else 0.0,
+        'trades': len(pnl),
+        'win_rate': (pnl > 0).mean() if len(pnl) else 0.0,
+        'profit_factor': pnl[pnl > 0].sum() / losses if losses > 0 else np.nan,
+    }
+
+
+def check_backtest_strategy(rows: int) -> None:
+    df = backtest.calculate_custom_indicator(make_frame(rows, 3)[['open', 'high', 'low', 'close', 'volume']])
+    expected, expected_df = baseline_backtest()(df.copy(), 500000.0)
+    results, result_df = backtest.backtest_strategy(df.copy())
+
+    for column in ('cash', 'stock_holding', 'total_asset'):
+        assert np.allclose(result_df[column], expected_df[column]), f"{column} 与改写前不一致"
+    for name in ('total_return', 'max_drawdown', 'sharpe_ratio', 'final_asset'):
+        assert np.isclose(results[name], expected[name]), f"{name}: {results[name]} != {expected[name]}"
+    assert not {'strategy_return', 'drawdown'} & set(result_df.columns)
+
+    trades = backtest_metrics.extract_trades(result_df['position'].to_numpy(), result_df['close'].to_numpy())
+    # 逐笔盈亏（未平仓按最后收盘价）之和等于资产变化
+    assert np.isclose(trades['pnl'].sum(), results['final_asset'] - 500000), "逐笔盈亏与资产变化不一致"
+    print(f"backtest_strategy 与改写前一致: {rows} 根K线, {results['trades']} 笔交易, "
+          f"交易胜率 {results['win_rate']:.2%}（改写前按日计算为 {expected['win_rate']:.2%}）, "
+          f"盈亏比 {results['profit_factor']:.2f}, 索提诺 {results['sortino_ratio']:.2f}, "
+          f"卡玛 {results['calmar_ratio']:.2f}, 最长回撤 {results['max_drawdown_duration']} 根")
+
+
+def sweep(rows: int, runs: int):
+    df = make_frame(rows, 7)
+    high, low, close = df['close'] + 1.5, df['close'] - 1.5, df['close'].to_numpy()
+    grid = list(itertools.islice(itertools.product(np.linspace(0.2, 0.5, 20), np.linspace(0.03, 0.12, 10),
+                                                   np.linspace(0.1, 0.4, 20)), runs))
+    position = np.stack([r_breaker.signals(high, low, close, *params)[2] for params in grid])
+    returns = np.diff(close) / close[:-1]
+    equity = np.concatenate([np.ones((len(grid), 1)),
+                             np.cumprod(1 + position[:, :-1] * returns, axis=1)], axis=1) * 1e6
+    price = np.broadcast_to(close, position.shape)
+    return equity, position, price
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--runs', type=int, default=2000)
+    args = parser.parse_args()
+
+    rolling.warm_up()
+    check_backtest_strategy(args.rows)
+
+    equity, position, price = sweep(args.rows, args.runs)
+    snapshot = (equity.copy(), position.copy())
+    started = time.perf_counter()
+    metrics = backtest_metrics.summarize(equity, position, price)
+    vector_s = time.perf_counter() - started
+    assert np.array_equal(equity, snapshot[0]) and np.array_equal(position, snapshot[1]), "输入被修改"
+
+    sample = min(len(equity), 100)
+    started = time.perf_counter()
+    expected = [reference_metrics(equity[i], position[i], price[i]) for i in range(sample)]
+    loop_s = (time.perf_counter() - started) * len(equity) / sample
+    for i, reference in enumerate(expected):
+        for name, value in reference.items():
+            assert np.isclose(metrics[name][i], value, equal_nan=True), f"第 {i} 次回测 {name}: {metrics[name][i]} != {value}"
+
+    print(f"{len(equity)} 次回测 x {args.rows} 根K线: 向量化 {vector_s * 1000:.0f}ms, "
+          f"逐次计算约 {loop_s:.1f}s（按 {sample} 次外推）, 共 {int(metrics['trades'].sum())} 笔交易")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmarks/bench_minute.py
+"""
+对比分钟线整段载入与按交易日分块流式处理的吞吐量和峰值内存。
+
+每个品种一年的合成1分钟线（约6万行）依次经过指标计算、日内 R-Breaker 信号和回测：
+- full：先载入全部品种的完整分钟线，再逐个品种整段计算；
+- stream：逐个品种按 --sessions 个交易日一块流式计算，只保留回测结果。
+两种模式在独立子进程中运行，并校验同一品种的回测结果与指标一致。
+
+用法: python benchmarks/bench_minute.py [--symbols 8] [--start 2023-01-01] [--end 2023-12-31] [--sessions 20]
+"""
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+import types
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import minute_bars  # noqa: E402
+import rolling  # noqa: E402
+from analysis_service import AnalysisService  # noqa: E402
+from bars import Bars  # noqa: E402
+
+backtest = importlib.import_module('RB回测')
+service = AnalysisService(types.SimpleNamespace(BAR_FLOAT_DTYPE='float64'), llm_client=object())
+
+
+def compute(frame: pd.DataFrame) -> pd.DataFrame:
+    return service.calculate_indicators(Bars.from_frame(frame, 'float64')).to_frame()
+
+
+def pipeline(chunks):
+    """指标 -> 日内信号 -> 回测，返回 (回测结果, 最后一块指标)"""
+    strategy = minute_bars.IntradayRBreaker()
+    last = {}
+
+    def signals():
+        for frame in minute_bars.stream_indicators(chunks, compute):
+            last['frame'] = frame
+            yield strategy.update(frame)
+
+    results, _ = backtest.backtest_stream(signals())
+    return results, last['frame']
+
+
+def process(mode: str, symbols: int, start: str, end: str, sessions: int) -> int:
+    rows = 0
+    if mode == 'full':
+        frames = [pd.concat(minute_bars.stub_minute_feed(start, end, seed=i)) for i in range(symbols)]
+        for frame in frames:
+            rows += len(frame)
+            pipeline([frame])
+    else:
+        for i in range(symbols):
+            def counted(chunks):
+                nonlocal rows
+                for chunk in chunks:
+                    rows += len(chunk)
+                    yield chunk
+            pipeline(counted(minute_bars.iter_sessions(minute_bars.stub_minute_feed(start, end, seed=i), sessions)))
+    return rows
+
+
+def run_mode(mode: str, symbols: int, start: str, end: str, sessions: int) -> None:
+    rolling.warm_up()
+    started = time.perf_counter()
+    rows = process(mode, symbols, start, end, sessions)
+    elapsed = time.perf_counter() - started
+
+    # 导入 numba/matplotlib 时的 RSS 高点会掩盖数据占用，峰值内存单独用 tracemalloc 统计一遍
+    tracemalloc.start()
+    process(mode, symbols, start, end, sessions)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{mode}: {rows} 行, {elapsed:.2f}s, {rows / elapsed:,.0f} 行/s, 数据峰值内存 {peak / 2 ** 20:.1f} MB")
+
+
+def check_parity(start: str, end: str) -> None:
+    full_results, full_frame = pipeline([pd.concat(minute_bars.stub_minute_feed(start, end))])
+    stream_results, stream_frame = pipeline(minute_bars.iter_sessions(minute_bars.stub_minute_feed(start, end)))
+    assert full_results == stream_results, (full_results, stream_results)
+    tail = full_frame.iloc[-len(stream_frame):]
+    for name in ('EMA12', 'EMA26', 'DEA', 'MIDA', 'UPPERA', 'RSI', 'ATR', 'channel_upper', 'MA_volume'):
+        assert np.allclose(tail[name], stream_frame[name], rtol=1e-9, equal_nan=True), name
+    print(f"分块与整段结果一致: 总收益率 {stream_results['total_return']:.2%}, 最大回撤 {stream_results['max_drawdown']:.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=8)
+    parser.add_argument('--start', default='2023-01-01')
+    parser.add_argument('--end', default='2023-12-31')
+    parser.add_argument('--sessions', type=int, default=20, help='stream 模式每块的交易日数')
+    parser.add_argument('--mode', choices=['full', 'stream'])
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.symbols, args.start, args.end, args.sessions)
+        return
+    check_parity(args.start, args.end)
+    for mode in ('full', 'stream'):
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--mode', mode, '--symbols', str(args.symbols),
+                        '--start', args.start, '--end', args.end, '--sessions', str(args.sessions)], check=True)
+
+
+if __name__ == "__main__":
+    main()
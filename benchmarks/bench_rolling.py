@@ -0,0 +1,143 @@
+# benchmarks/bench_rolling.py
+"""
+校验 rolling 内核与 pandas 结果一致，并对比指标计算耗时。
+
+1. 各内核在含缺失值、量级较大的随机游走上与 pandas rolling/ewm 逐元素比较；
+2. calculate_indicators 与 RB回测.calculate_custom_indicator 与改造前的 pandas 写法比较。
+
+用法: python benchmarks/bench_rolling.py [--rows 5000] [--repeat 20]
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+import types
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import rolling  # noqa: E402
+from analysis_service import AnalysisService  # noqa: E402
+from bars import Bars  # noqa: E402
+from bench_bars import make_frame  # noqa: E402
+
+backtest = importlib.import_module('RB回测')
+
+
+def legacy_custom_indicator(df: pd.DataFrame) -> pd.DataFrame:
+    """改造前 calculate_custom_indicator 的 pandas 写法"""
+    df['LC'] = df['close'].shift(1)
+    df['VID'] = df['volume'].rolling(2).sum() / ((df['high'].rolling(2).max() - df['low'].rolling(2).min()) * 100)
+    df['RC'] = (df['close'] - df['LC']) * df['VID']
+    df['LONG'] = df['RC'].cumsum()
+    df['DIFF'] = df['LONG'].rolling(10).mean()
+    df['DEA'] = df['LONG'].rolling(20).mean()
+    df['LON'] = df['DIFF'] - df['DEA']
+    df['LLL'] = df['LON'].rolling(10).mean()
+    df['V2'] = df['LON'].ewm(span=1).mean()
+    df['V3'] = df['V2'].ewm(span=3).mean()
+    df['V4'] = df['V3'].ewm(span=3).mean()
+    df['V5'] = df['V4'].ewm(span=3).mean()
+    df['V6'] = df['V5'].ewm(span=3).mean()
+    return df
+
+
+def pandas_indicators(df: pd.DataFrame) -> dict:
+    """改造前 calculate_indicators 中逐列调用 pandas 的写法"""
+    close, high, low = df['close'], df['high'], df['low']
+    prev_close = close.shift(1)
+    ema12 = close.ewm(span=12, adjust=False).mean()
+    ema26 = close.ewm(span=26, adjust=False).mean()
+    dif = ema12 - ema26
+    dea = dif.ewm(span=9, adjust=False).mean()
+    mida = close.rolling(window=20).mean()
+    std = close.rolling(window=20).std()
+    delta = close.diff()
+    rsi = 100 - (100 / (1 + delta.clip(lower=0).rolling(window=14).mean() /
+                        (-delta).clip(lower=0).rolling(window=14).mean()))
+    true_range = np.fmax(np.fmax(high - low, (high - prev_close).abs()), (low - prev_close).abs())
+    return dict(EMA12=ema12, EMA26=ema26, DIF=dif, DEA=dea, MACD=(dif - dea) * 2, MIDA=mida,
+                UPPERA=mida + 2 * std, LOWERA=mida - 2 * std, RSI=rsi, ATR=true_range.rolling(14).mean(),
+                channel_upper=mida.rolling(window=15).max(), channel_lower=mida.rolling(window=15).min(),
+                MA_volume=df['volume'].rolling(window=20).mean())
+
+
+def check(name: str, actual, expected, rtol: float = 1e-7, atol: float = 1e-9) -> None:
+    actual, expected = np.asarray(actual, dtype=np.float64), np.asarray(expected, dtype=np.float64)
+    if not np.allclose(actual, expected, rtol=rtol, atol=atol, equal_nan=True):
+        raise AssertionError(f"{name} 与参考值不一致，最大误差 {np.nanmax(np.abs(actual - expected))}")
+
+
+def check_kernels(rows: int) -> None:
+    rng = np.random.default_rng(0)
+    x = 1e4 + rng.standard_normal(rows).cumsum()
+    x[rng.choice(rows, rows // 100, replace=False)] = np.nan
+    series = pd.Series(x)
+    windows = [1, 2, 10, 20, 60]
+    for w, (mean, std) in rolling.rolling_mean_std(x, windows).items():
+        check(f"mean{w}", mean, series.rolling(w).mean())
+        # pandas 的滚动标准差本身有舍入误差累积，以两遍法精确值为准，同时给出两者误差
+        exact = np.full(rows, np.nan)
+        if w > 1:
+            exact[w - 1:] = np.lib.stride_tricks.sliding_window_view(x, w).std(axis=1, ddof=1)
+        check(f"std{w}", std, exact, atol=1e-6)
+        if w > 1:
+            print(f"  std{w} 最大绝对误差: 内核 {np.nanmax(np.abs(std - exact)):.1e}, "
+                  f"pandas {np.nanmax(np.abs(series.rolling(w).std().to_numpy() - exact)):.1e}")
+    for w, (high, low) in rolling.rolling_extrema(x, windows).items():
+        check(f"max{w}", high, series.rolling(w).max())
+        check(f"min{w}", low, series.rolling(w).min())
+    for adjust in (False, True):
+        for span, values in rolling.ema(x, [2, 9, 12, 26], adjust).items():
+            check(f"ema{span}", values, series.ewm(span=span, adjust=adjust).mean())
+        expected = series
+        for i, values in enumerate(rolling.ema_chain(x, [1, 3, 3, 3, 3], adjust)):
+            expected = expected.ewm(span=[1, 3, 3, 3, 3][i], adjust=adjust).mean()
+            check(f"ema_chain{i}", values, expected)
+    print(f"内核与 pandas 一致（{rows} 个点，含 {rows // 100} 个缺失值）")
+
+
+def timed(func, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rolling.warm_up()
+    print(f"内核编译/加载 {time.perf_counter() - started:.2f}s")
+    check_kernels(100000)
+
+    df = make_frame(args.rows, 0)
+    service = AnalysisService(types.SimpleNamespace(BAR_FLOAT_DTYPE='float64'), llm_client=object())
+    bars = Bars.from_frame(df, 'float64')
+    legacy = pandas_indicators(df)
+    current = service.calculate_indicators(bars)
+    for name in ('EMA12', 'EMA26', 'DIF', 'DEA', 'MACD', 'MIDA', 'UPPERA', 'LOWERA', 'RSI', 'ATR',
+                 'channel_upper', 'channel_lower', 'MA_volume'):
+        check(name, current.values(name), legacy[name])
+    custom = backtest.calculate_custom_indicator(df.copy())
+    expected = legacy_custom_indicator(df.copy())
+    for name in ('VID', 'DIFF', 'DEA', 'LON', 'LLL', 'V2', 'V3', 'V4', 'V5', 'V6'):
+        check(name, custom[name], expected[name])
+    print("calculate_indicators / calculate_custom_indicator 与改造前一致")
+
+    print(f"calculate_indicators: pandas {timed(lambda: pandas_indicators(df), args.repeat):.2f}ms, "
+          f"内核 {timed(lambda: service.calculate_indicators(bars), args.repeat):.2f}ms")
+    print(f"calculate_custom_indicator: pandas {timed(lambda: legacy_custom_indicator(df.copy()), args.repeat):.2f}ms, "
+          f"内核 {timed(lambda: backtest.calculate_custom_indicator(df.copy()), args.repeat):.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# benchmarks/bench_startup.py
+"""
+测量冷启动时间：启动 uvicorn 子进程，分别记录 /health 与 /ready 首次返回 200 的耗时。
+
+预热只调用 ts.set_token/pro_api，不访问行情接口，未配置环境变量时使用占位值。
+用法: python benchmarks/bench_startup.py [--runs 3] [--port 8765]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_for(url: str, deadline: float) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(url)
+
+
+def run_once(port: int) -> tuple:
+    env = dict(os.environ)
+    for name in ("TUSHARE_TOKEN", "OPENAI_API_KEY", "API_URL"):
+        env.setdefault(name, "benchmark")
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        health = wait_for(f"http://127.0.0.1:{port}/health", started + 60) - started
+        ready = wait_for(f"http://127.0.0.1:{port}/ready", started + 60) - started
+    finally:
+        process.terminate()
+        process.wait()
+    return health, ready
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    for i in range(args.runs):
+        health, ready = run_once(args.port)
+        print(f"第{i + 1}次: /health {health:.2f}s, /ready {ready:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
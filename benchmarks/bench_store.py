@@ -0,0 +1,103 @@
+# benchmarks/bench_store.py
+"""
+对比逐次回测宽 CSV 与列式存储（BacktestStore）的磁盘占用、写入耗时和按列读取耗时。
+
+生成一组参数扫描的回测（自定义指标 + backtest_strategy，每次约 30 列），
+分别写成每次一个 CSV 和分区 Parquet，然后按指标选出若干回测读取资产曲线，
+并校验列式存储读回的数据与原始结果一致。
+
+用法: python benchmarks/bench_store.py [--runs 200] [--rows 870] [--select 20]
+"""
+import argparse
+import importlib
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import rolling  # noqa: E402
+from backtest_store import BacktestRun, BacktestStore  # noqa: E402
+from bench_bars import make_frame  # noqa: E402
+
+backtest = importlib.import_module('RB回测')
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def sweep(runs: int, rows: int):
+    frame = backtest.calculate_custom_indicator(make_frame(rows, 5)[['open', 'high', 'low', 'close', 'volume']])
+    grid = itertools.product(np.linspace(0.1, 0.9, 9), np.linspace(0.02, 0.10, 9), np.linspace(0.05, 0.30, 6))
+    for i, (ratio, stop_loss, take_profit) in enumerate(itertools.islice(grid, runs)):
+        results, df = backtest.backtest_strategy(frame.copy(), 500000, ratio, stop_loss, take_profit)
+        params = {'position_ratio': ratio, 'stop_loss_pct': stop_loss, 'take_profit_pct': take_profit}
+        yield BacktestRun(f"sz{300000 + i % 10}", 'custom', df, results, params)
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--rows', type=int, default=870)
+    parser.add_argument('--select', type=int, default=20)
+    args = parser.parse_args()
+
+    rolling.warm_up()
+    runs = list(sweep(args.runs, args.rows))
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_dir = os.path.join(tmp, 'csv')
+        os.makedirs(csv_dir)
+
+        def write_csv():
+            for run in runs:
+                run.frame.to_csv(os.path.join(csv_dir, f"{run.symbol}_{run.run_id}_backtest_result.csv"), index=True)
+
+        store = BacktestStore(os.path.join(tmp, 'store'))
+        _, csv_write_ms = timed(write_csv)
+        _, store_write_ms = timed(lambda: store.save_many(runs))
+
+        # 按夏普比率选出若干回测，只读取资产曲线
+        index, index_ms = timed(store.runs)
+        selected = list(index.sort_values('sharpe_ratio', ascending=False).index[:args.select])
+        by_id = {run.run_id: run for run in runs}
+
+        def read_csv():
+            return {run_id: pd.read_csv(os.path.join(csv_dir, f"{by_id[run_id].symbol}_{run_id}_backtest_result.csv"),
+                                        usecols=['date', 'total_asset'], index_col='date', parse_dates=['date'])
+                    for run_id in selected}
+
+        _, csv_read_ms = timed(read_csv)
+        wide, store_read_ms = timed(lambda: store.compare(selected, 'total_asset', index))
+
+        for run_id in selected:
+            assert np.array_equal(wide[run_id].to_numpy(), by_id[run_id].frame['total_asset'].to_numpy()), run_id
+        full = store.load(selected[:1], index=index).drop(columns='run_id')
+        original = by_id[selected[0]].frame
+        assert list(full.columns) == list(original.columns)
+        assert np.allclose(full.to_numpy(dtype=np.float64), original.to_numpy(dtype=np.float64), equal_nan=True)
+        assert len(index) == len(runs) and index.loc[selected[0], 'param_position_ratio'] == \
+            by_id[selected[0]].params['position_ratio']
+
+        columns = len(runs[0].frame.columns)
+        print(f"{len(runs)} 次回测 x {args.rows} 行 x {columns} 列")
+        print(f"CSV:     {directory_size(csv_dir) / 2 ** 20:7.2f} MB, 写入 {csv_write_ms:7.0f}ms, "
+              f"读取 {args.select} 次回测的资产曲线 {csv_read_ms:6.0f}ms")
+        print(f"Parquet: {directory_size(store.root) / 2 ** 20:7.2f} MB, 写入 {store_write_ms:7.0f}ms, "
+              f"读取 {args.select} 次回测的资产曲线 {store_read_ms:6.0f}ms（读取索引 {index_ms:.0f}ms）")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,38 @@ class Settings(BaseSettings):
     MODEL_NAME: str = "groq"
     BASE_URL: str = Field(default="", env="BASE_URL")
     FONT_PATH: str = "./static/fonts/imhei.ttf"
+    DATA_CACHE_DIR: str = "./data"  # 本地行情缓存目录
+    MINUTE_DATA_DIR: str = "./data/minute"  # 本地分钟线目录，{代码}.csv 或 {代码}/*.csv
+    MINUTE_MAX_SESSIONS: int = 60  # 分钟线分析一次载入的交易日数上限，超出时取最近的部分
+    BAR_FLOAT_DTYPE: str = "float32"  # K线价格及指标精度，float32 内存减半
+    SHARED_CACHE_ENABLED: bool = True  # 多 worker 共享的 mmap K线缓存
+    SHARED_CACHE_DIR: str = ""  # 为空时优先使用 /dev/shm
+    SHARED_CACHE_TTL: int = 3600  # 包含当日数据的条目过期秒数
+    SHARED_CACHE_MAX_MB: int = 1024  # 共享缓存总大小上限，超出时淘汰最久未访问的条目
+    ARTIFACT_MAX_BYTES: int = 512 * 1024 * 1024  # output 目录容量上限
+    ARTIFACT_MAX_AGE: int = 7 * 86400  # 分析产物保留秒数
+    ARTIFACT_REVALIDATE_AFTER: float = 5.0  # 产物索引条目超过该秒数才按文件状态重新核对
+    PROMPT_VERBOSITY: str = "standard"  # 分析提示详略: brief/standard/detailed
+    PROMPT_TOKEN_BUDGET: int = 600  # 分析提示 token 上限（本地估算）
+    # LLM 服务列表（JSON），按顺序故障转移，例如
+    # [{"name": "primary", "url": "...", "api_key": "...", "model": "...", "max_concurrency": 4, "timeout": 60}]
+    # 为空时使用 API_URL / OPENAI_API_KEY / MODEL_NAME
+    LLM_PROVIDERS: list = []
+    LLM_TIMEOUT: float = 60.0  # 单次请求超时（秒）
+    LLM_MAX_CONCURRENCY: int = 4  # 每个服务的最大并发
+    LLM_HEDGE_DELAY: float = 0.0  # 超过该秒数未返回时向下一个服务发出对冲请求，0 表示只做失败转移
+    LLM_BREAKER_THRESHOLD: int = 3  # 连续失败多少次后熔断
+    LLM_BREAKER_COOLDOWN: float = 30.0  # 熔断冷却时间（秒）
+    LLM_BATCH_SIZE: int = 8  # 多品种报告每次请求合并的品种数
+    LIVE_FEED: str = "replay"  # 实时行情源: replay 回放 MINUTE_DATA_DIR 下的分钟线, stub 合成行情
+    LIVE_REPLAY_INTERVAL: float = 1.0  # 回放/合成行情每根K线的间隔（秒）
+    LIVE_QUEUE_SIZE: int = 256  # 每个订阅者的消息队列长度，满时丢弃最旧消息
+    ADMISSION_MAX_CONCURRENCY: int = 4  # /analyze 与 /report 同时处理的请求数
+    ADMISSION_MAX_QUEUE: int = 32  # 排队请求上限，超出返回 429
+    ADMISSION_MAX_WAIT: float = 30.0  # 预计或实际排队超过该秒数返回 429
+    ADMISSION_CLIENT_RATE: float = 0.2  # 每个客户端每秒补充的请求数
+    ADMISSION_CLIENT_BURST: int = 5  # 每个客户端可突发的请求数
+    ADMISSION_CLIENT_HEADER: str = ""  # 识别客户端的请求头（如反向代理的 X-Real-IP），为空时使用连接地址
     FUTURES_EXCHANGE: str = "CFFEX"  # 中金所
     FUTURES_TYPES: list = ["IF", "IC", "IH"]  # 主要股指期货品种
     FUTURES_DATA_FIELDS: list = ["ts_code", "trade_date", "open", "high", "low", "close", "vol", "amount"]
@@ -2,15 +2,31 @@ import tushare as ts
 import pandas as pd
 from datetime import datetime, timedelta
 import logging
+import os
 import re
+from futures_service import ContinuousContractService
+from resampler import parse_timeframe, resample_bars
+from minute_bars import iter_sessions, read_minute_source
+from collections import deque
+from typing import Iterator, Tuple
+from bars import Bars
+from shared_cache import SharedBarCache
 
 class DataService:
-    def __init__(self, tushare_token: str):
+    def __init__(self, tushare_token: str, cache_dir: str = "./data", shared_cache: SharedBarCache = None,
+                 minute_dir: str = None, max_minute_sessions: int = 60):
         """
         初始化DataService，传入Tushare token，配置API访问。
+        shared_cache 不为空时，get_bars 的结果在多个 worker 进程间共享。
+        minute_dir 为本地分钟线目录，默认 cache_dir/minute。
+        max_minute_sessions 为 get_data 一次载入的分钟线交易日数上限。
         """
         ts.set_token(tushare_token)
         self.pro = ts.pro_api()
+        self.continuous = ContinuousContractService(self.pro, os.path.join(cache_dir, "futures"))
+        self.shared_cache = shared_cache
+        self.minute_dir = minute_dir or os.path.join(cache_dir, "minute")
+        self.max_minute_sessions = max_minute_sessions
 
         # 合并期货交易所和合约映射为字典
         self.future_exchanges = {
@@ -116,54 +132,34 @@ class DataService:
         except ValueError as e:
             raise ValueError(f"日期格式错误，请使用YYYY-MM-DD格式: {e}")
 
-    def get_data(self, symbol: str, start_date: str, end_date: str, data_type: str) -> pd.DataFrame:
+    def get_data(self, symbol: str, start_date: str, end_date: str, data_type: str, timeframe: str = 'D') -> pd.DataFrame:
         """
         获取股票、期货或指数的历史数据。
+
+        远程只获取日线，周线/月线等更大周期由本地聚合得到，不再额外调用Tushare；
+        分钟周期读取本地分钟线文件，区间超过 max_minute_sessions 个交易日时只返回最近的部分，
+        完整区间请用 iter_minute_bars 分块处理。
         """
         try:
-            # 验证并格式化代码和日期
+            # 验证并格式化代码、周期和日期
             symbol = self.validate_stock_code(symbol, data_type)
+            kind, _ = parse_timeframe(timeframe)
             start_date, end_date = self.validate_dates(start_date, end_date)
 
             logging.info(f"获取数据: {symbol} 从 {start_date} 到 {end_date}")
 
+            if kind == 'min':
+                return self._recent_minute_bars(symbol, start_date, end_date, timeframe)
+
             # 根据数据类型获取不同的数据
             if data_type == 'futures':
-                # 解析合约信息
-                match = re.match(r'([A-Za-z]+)(\d{4})\.(.*)', symbol)
+                match = re.match(r'([A-Za-z]+)\.(.*)', symbol)
                 if match:
-                    product, contract_month, exchange = match.groups()
-                    
-                    # 获取当前可交易的合约
-                    current_contracts = self.pro.fut_basic(
-                        exchange=exchange,
-                        fut_type='1',
-                        fields='ts_code,symbol,list_date,delist_date'
-                    )
-                    
-                    # 过滤出指定品种的合约
-                    product_contracts = current_contracts[
-                        current_contracts['ts_code'].str.startswith(f"{product}")
-                    ]
-                    
-                    if product_contracts.empty:
-                        raise ValueError(f"未找到 {product} 的可交易合约")
-                    
-                    # 获取最近的可交易合约
-                    valid_contract = product_contracts.sort_values('delist_date', ascending=False).iloc[0]
-                    symbol = valid_contract['ts_code']
-                    logging.info(f"使用最近可交易合约: {symbol}")
-
-                # 获取期货数据
-                df = self.pro.fut_weekly_monthly(
-                    ts_code=symbol,
-                    start_date=start_date,
-                    end_date=end_date,
-                    freq='week'
-                )
-                
-                if df.empty:
-                    # 如果周线数据为空，尝试获取日线数据
+                    # 品种代码（例如：IF.CFFEX）使用按持仓量换月的主力连续合约
+                    product, exchange = match.groups()
+                    df = self.continuous.get_main_series(product, exchange, start_date, end_date)
+                else:
+                    # 具体合约直接获取该合约日线
                     df = self.pro.fut_daily(
                         ts_code=symbol,
                         start_date=start_date,
@@ -208,11 +204,105 @@ class DataService:
             }
             df.rename(columns={col: column_mapping.get(col, col) for col in df.columns}, inplace=True)
 
-            return df
+            return resample_bars(df, timeframe)
         except Exception as e:
             logging.error(f"获取 {symbol} 从 {start_date} 到 {end_date} 的数据时发生错误: {str(e)}")
             raise ValueError(f"获取数据失败: {str(e)}")
 
+    def iter_minute_bars(self, symbol: str, start_date: str, end_date: str, timeframe: str = '1min',
+                         sessions_per_chunk: int = 20) -> Iterator[pd.DataFrame]:
+        """
+        按交易日分块产出本地分钟线，每块包含 sessions_per_chunk 个完整交易日，
+        N 分钟周期在块内聚合，整个区间不会同时载入内存。
+
+        数据位于 minute_dir 下的 {代码}.csv 文件或 {代码}/ 目录（目录内的 CSV 按文件名顺序读取）。
+        """
+        kind, minutes = parse_timeframe(timeframe)
+        if kind != 'min':
+            raise ValueError(f"{timeframe} 不是分钟周期")
+        code = symbol.strip().upper()
+        path = next((p for p in (os.path.join(self.minute_dir, code), os.path.join(self.minute_dir, f"{code}.csv"))
+                     if os.path.exists(p)), None)
+        if path is None:
+            raise ValueError(f"未找到 {code} 的本地分钟线数据，请放置于 {self.minute_dir}/{code}.csv 或 {self.minute_dir}/{code}/")
+        for chunk in iter_sessions(read_minute_source(path, start_date, end_date), sessions_per_chunk):
+            yield resample_bars(chunk, timeframe) if minutes > 1 else chunk
+
+    def _recent_minute_bars(self, symbol: str, start_date: str, end_date: str, timeframe: str) -> pd.DataFrame:
+        """
+        分块读取分钟线，只保留最近 max_minute_sessions 个交易日，内存占用不随区间长度增长。
+        截断时在 df.attrs['covered_start'] 记录实际返回的首个日期（YYYY-MM-DD）。
+        """
+        recent, kept, total = deque(), 0, 0
+        for chunk in self.iter_minute_bars(symbol, start_date, end_date, timeframe):
+            sessions = _session_count(chunk)
+            recent.append((chunk, sessions))
+            kept += sessions
+            total += sessions
+            while kept - recent[0][1] >= self.max_minute_sessions:
+                kept -= recent.popleft()[1]
+        if not recent:
+            raise ValueError(f"未找到 {symbol} 从 {start_date} 到 {end_date} 的分钟线数据")
+
+        df = pd.concat([chunk for chunk, _ in recent])
+        if total > self.max_minute_sessions:
+            days = _session_keys(df)
+            first = pd.unique(days)[-self.max_minute_sessions]
+            df = df[days >= first]
+            df.attrs['covered_start'] = df.index[0].strftime('%Y-%m-%d')
+            logging.warning(f"{symbol} 分钟线区间共 {total} 个交易日，超过上限 {self.max_minute_sessions}，"
+                            f"只返回 {df.index[0]:%Y-%m-%d} 起的数据")
+        return df
+
+    def get_bars(self, symbol: str, start_date: str, end_date: str, data_type: str,
+                 timeframe: str = 'D', float_dtype: str = 'float32') -> Bars:
+        """
+        获取历史数据并转换为紧凑的只读 Bars，供分析各阶段共享。
+
+        共享缓存中周线/月线保存的是日线：聚合结果取决于区间起止（首尾可能是不完整的周/月），
+        因此先按请求区间切片再聚合，与不经缓存直接获取的结果一致。
+        """
+        if self.shared_cache is None:
+            return Bars.from_frame(self.get_data(symbol, start_date, end_date, data_type, timeframe), float_dtype)
+
+        base = self._cached_timeframe(timeframe)
+
+        def load(start: str, end: str) -> Tuple[Bars, str]:
+            df = self.get_data(symbol, start, end, data_type, base)
+            # 分钟线超出交易日上限时只返回区间末尾部分，缓存只记录实际覆盖的区间
+            return Bars.from_frame(df, float_dtype), df.attrs.get('covered_start', start)
+
+        key = self._bars_key(symbol, data_type, base, float_dtype)
+        # 主力连续合约后复权，换月后历史价格整体调整，条目不能永久保留
+        bars = self.shared_cache.get_or_load(key, start_date, end_date, load,
+                                             settled=not self._is_continuous(symbol, data_type))
+        if base != timeframe:
+            bars = Bars.from_frame(resample_bars(bars.to_frame(), timeframe), float_dtype)
+        return bars
+
+    def has_cached_bars(self, symbol: str, start_date: str, end_date: str, data_type: str,
+                        timeframe: str = 'D', float_dtype: str = 'float32') -> bool:
+        """get_bars 的结果是否已在共享缓存中（无需请求 Tushare）"""
+        if self.shared_cache is None:
+            return False
+        key = self._bars_key(symbol, data_type, self._cached_timeframe(timeframe), float_dtype)
+        return self.shared_cache.get(key, start_date, end_date) is not None
+
+    @staticmethod
+    def _cached_timeframe(timeframe: str) -> str:
+        """共享缓存中保存的周期：周线/月线保存日线，读取后再聚合；日线和分钟线按交易日切片即可，直接保存"""
+        kind, _ = parse_timeframe(timeframe)
+        return 'D' if kind in ('W', 'M') else timeframe
+
+    @staticmethod
+    def _bars_key(symbol: str, data_type: str, timeframe: str, float_dtype: str) -> str:
+        return f"{data_type}:{symbol.strip().upper()}:{timeframe}:{float_dtype}"
+
+    @staticmethod
+    def _is_continuous(symbol: str, data_type: str) -> bool:
+        """期货品种代码（如 IF、IF.CFFEX）对应主力连续合约，具体合约带月份数字"""
+        return data_type == 'futures' and symbol.strip().split('.')[0].isalpha()
+
     def get_current_future_contract(self, symbol: str, date: str) -> str:
         """
         获取期货品种当前最活跃的合约。
@@ -254,4 +344,13 @@ class DataService:
             df = self.get_data(symbol, start_date, end_date, 'futures')
             return not df.empty
         except Exception:
-            return False
\ No newline at end of file
+            return False
+
+
+def _session_keys(df: pd.DataFrame):
+    """分钟线所属交易日：有 trade_date 列时使用该列（夜盘归属下一交易日），否则取自然日"""
+    return df['trade_date'].to_numpy() if 'trade_date' in df.columns else df.index.normalize().to_numpy()
+
+
+def _session_count(df: pd.DataFrame) -> int:
+    return len(pd.unique(_session_keys(df)))
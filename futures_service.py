@@ -0,0 +1,207 @@
+# futures_service.py
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from futures_config import FuturesConfig
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'settle']
+BAR_COLUMNS = ['ts_code', 'trade_date', 'open', 'high', 'low', 'close', 'settle',
+               'vol', 'amount', 'oi', 'oi_chg']
+
+
+class ContinuousContractService:
+    """
+    期货主力连续合约服务。
+
+    按持仓量(oi)在各月份合约之间换月拼接日线，并做复权(价差/比例)处理。
+    单合约日线与拼接结果都缓存在本地，已摘牌合约只下载一次，
+    活跃合约按最后缓存日期增量更新。
+    """
+
+    def __init__(self, pro, cache_dir: str = "./data/futures"):
+        self.pro = pro
+        self.cache_dir = cache_dir
+        self.contract_dir = os.path.join(cache_dir, "contracts")
+        os.makedirs(self.contract_dir, exist_ok=True)
+
+    def get_main_series(self, product: str, exchange: str, start_date: str, end_date: str,
+                        adjust: Optional[str] = 'add',
+                        months: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        获取主力连续合约日线，日期格式为YYYYMMDD。
+
+        :param adjust: 'add' 价差后复权，'ratio' 比例后复权，None 不复权
+        :param months: 参与换月的合约月份，默认使用 FuturesConfig.MAIN_CONTRACT_MONTHS
+        """
+        if adjust not in ('add', 'ratio', None):
+            raise ValueError(f"不支持的复权方式: {adjust}")
+        months = FuturesConfig.MAIN_CONTRACT_MONTHS if months is None else months
+        product = product.upper()
+        key = f"{product}_{''.join(months) or 'all'}_{adjust or 'none'}"
+
+        cached = self._read_series_cache(key, start_date, end_date)
+        if cached is not None:
+            logging.info(f"主力连续合约缓存命中: {key}")
+            return cached
+
+        # 缓存区间为历次请求区间的并集，换月后复权因子会变化，因此整段重新拼接
+        build_start, build_end = self._cached_range(key, start_date, end_date)
+        contracts = self._load_contracts(product, exchange, months)
+        contracts = contracts[(contracts['list_date'] <= build_end) & (contracts['delist_date'] >= build_start)]
+        if contracts.empty:
+            raise ValueError(f"未找到 {product} 在 {start_date} 到 {end_date} 之间的合约")
+
+        frames = [self._load_contract_bars(row.ts_code, row.list_date, row.delist_date)
+                  for row in contracts.itertuples()]
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            raise ValueError(f"{product}.{exchange} 的 {len(contracts)} 个合约在 {start_date} 到 {end_date} 之间均无日线数据")
+        bars = pd.concat(frames, ignore_index=True)
+        series = self.stitch(bars, contracts['ts_code'].tolist(), adjust)
+
+        series = series[(series['trade_date'] >= build_start) & (series['trade_date'] <= build_end)]
+        self._write_series_cache(key, series.reset_index(drop=True), build_start, build_end)
+        return series[(series['trade_date'] >= start_date) & (series['trade_date'] <= end_date)].reset_index(drop=True)
+
+    @staticmethod
+    def stitch(bars: pd.DataFrame, contract_order: List[str], adjust: Optional[str] = 'add') -> pd.DataFrame:
+        """
+        按持仓量拼接主力连续合约。
+
+        每个交易日沿用前一交易日持仓量最大的合约(避免未来函数)，且只向更远月份换月；
+        换月缺口取换月前一日新旧合约收盘价之差(或之比)，向历史方向累积复权。
+        """
+        def pivot(column: str) -> np.ndarray:
+            table = bars.pivot(index='trade_date', columns='ts_code', values=column)
+            return table.reindex(columns=contract_order).to_numpy(dtype=float)
+
+        dates = np.sort(bars['trade_date'].unique())
+        oi = pivot('oi')
+        close = pivot('close')
+        n = len(dates)
+        rows = np.arange(n)
+
+        # 当日持仓量最大的合约，且不回滚到更近月份
+        leader = np.nanargmax(np.where(np.isnan(oi), -1.0, oi), axis=1)
+        held = np.maximum.accumulate(leader)
+        held_prev = np.concatenate([held[:1], held[:-1]])
+        chosen = np.where(np.isnan(close[rows, held_prev]), held, held_prev)
+
+        roll = np.zeros(n, dtype=bool)
+        roll[1:] = chosen[1:] != chosen[:-1]
+        prev_rows = np.maximum(rows - 1, 0)
+        old_close = close[prev_rows, np.concatenate([chosen[:1], chosen[:-1]])]
+        new_close = close[prev_rows, chosen]
+        # 新合约前一日无成交时，退而使用换月当日的价格关系
+        fallback = np.isnan(new_close) | np.isnan(old_close)
+        old_close = np.where(fallback, close[rows, np.concatenate([chosen[:1], chosen[:-1]])], old_close)
+        new_close = np.where(fallback, close[rows, chosen], new_close)
+
+        if adjust == 'ratio':
+            ratio = np.where(roll, new_close / old_close, 1.0)
+            ratio = np.where(np.isfinite(ratio), ratio, 1.0)
+            cum = np.cumprod(ratio)
+            factor = cum[-1] / cum
+        elif adjust == 'add':
+            gap = np.where(roll, new_close - old_close, 0.0)
+            gap = np.nan_to_num(gap)
+            cum = np.cumsum(gap)
+            factor = cum[-1] - cum
+        else:
+            factor = np.zeros(n)
+
+        selected = pd.DataFrame({'trade_date': dates, 'ts_code': np.asarray(contract_order)[chosen]})
+        series = selected.merge(bars, on=['trade_date', 'ts_code'], how='left')
+        series = series.reindex(columns=BAR_COLUMNS)
+        for column in PRICE_COLUMNS:
+            if adjust == 'ratio':
+                series[column] = series[column] * factor
+            else:
+                series[column] = series[column] + factor
+        series['adj_factor'] = factor
+        series['is_roll'] = roll
+        return series
+
+    def _load_contracts(self, product: str, exchange: str, months: List[str]) -> pd.DataFrame:
+        """读取合约列表，本地缓存按天刷新"""
+        path = os.path.join(self.cache_dir, f"{exchange}_contracts.pkl")
+        today = datetime.now().strftime('%Y%m%d')
+        if os.path.exists(path) and datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y%m%d') == today:
+            contracts = pd.read_pickle(path)
+        else:
+            contracts = self.pro.fut_basic(
+                exchange=exchange,
+                fut_type='1',
+                fields='ts_code,symbol,list_date,delist_date'
+            )
+            contracts.to_pickle(path)
+
+        pattern = re.compile(rf"^{product}\d{{2}}(\d{{2}})\.")
+        month = contracts['ts_code'].str.extract(pattern, expand=False)
+        mask = month.notna()
+        if months:
+            mask &= month.isin(months)
+        return contracts[mask].sort_values('delist_date').reset_index(drop=True)
+
+    def _load_contract_bars(self, ts_code: str, list_date: str, delist_date: str) -> pd.DataFrame:
+        """读取单合约日线，已摘牌合约只下载一次，活跃合约增量更新"""
+        path = os.path.join(self.contract_dir, f"{ts_code}.pkl")
+        today = datetime.now().strftime('%Y%m%d')
+        cached = pd.read_pickle(path) if os.path.exists(path) else None
+
+        if cached is not None and not cached.empty:
+            last_date = cached['trade_date'].max()
+            if last_date >= min(delist_date, today):
+                return cached
+            fetch_start = (pd.Timestamp(last_date) + pd.Timedelta(days=1)).strftime('%Y%m%d')
+        else:
+            fetch_start = list_date
+        if fetch_start > today:
+            return cached if cached is not None else pd.DataFrame(columns=BAR_COLUMNS)
+
+        fresh = self.pro.fut_daily(ts_code=ts_code, start_date=fetch_start, end_date=min(delist_date, today))
+        fresh = fresh.reindex(columns=BAR_COLUMNS)
+        bars = fresh if cached is None else pd.concat([cached, fresh], ignore_index=True)
+        bars = bars.drop_duplicates('trade_date', keep='last').sort_values('trade_date').reset_index(drop=True)
+        bars.to_pickle(path)
+        logging.info(f"合约 {ts_code} 日线已更新: {fetch_start} 起 {len(fresh)} 条")
+        return bars
+
+    def _read_series_cache(self, key: str, start_date: str, end_date: str) -> Optional[pd.DataFrame]:
+        """连续合约缓存覆盖请求区间且当日已更新时直接读取"""
+        meta_path = os.path.join(self.cache_dir, f"{key}.json")
+        data_path = os.path.join(self.cache_dir, f"{key}.pkl")
+        if not (os.path.exists(meta_path) and os.path.exists(data_path)):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as meta_file:
+            meta = json.load(meta_file)
+
+        today = datetime.now().strftime('%Y%m%d')
+        fresh = end_date < meta['updated'] or meta['updated'] == today
+        if start_date < meta['start_date'] or end_date > meta['end_date'] or not fresh:
+            return None
+        series = pd.read_pickle(data_path)
+        return series[(series['trade_date'] >= start_date) & (series['trade_date'] <= end_date)].reset_index(drop=True)
+
+    def _cached_range(self, key: str, start_date: str, end_date: str) -> tuple:
+        """合并已缓存区间与请求区间"""
+        meta_path = os.path.join(self.cache_dir, f"{key}.json")
+        if not os.path.exists(meta_path):
+            return start_date, end_date
+        with open(meta_path, "r", encoding="utf-8") as meta_file:
+            meta = json.load(meta_file)
+        return min(meta['start_date'], start_date), max(meta['end_date'], end_date)
+
+    def _write_series_cache(self, key: str, series: pd.DataFrame, start_date: str, end_date: str) -> None:
+        """缓存拼接结果及其覆盖区间"""
+        meta = {'start_date': start_date, 'end_date': end_date, 'updated': datetime.now().strftime('%Y%m%d')}
+        series.to_pickle(os.path.join(self.cache_dir, f"{key}.pkl"))
+        with open(os.path.join(self.cache_dir, f"{key}.json"), "w", encoding="utf-8") as meta_file:
+            json.dump(meta, meta_file)
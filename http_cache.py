@@ -0,0 +1,109 @@
+# http_cache.py
+import gzip
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只使用 gzip
+    brotli = None
+
+# 可压缩的响应类型，PNG 等已压缩格式不再重复压缩
+COMPRESSIBLE_TYPES = ('application/json', 'text/html', 'text/css', 'text/plain', 'application/javascript')
+
+# 地址中的版本号为产物内容 SHA-1 的前 16 位，内容变化版本号随之变化，带版本号的地址可长期缓存
+IMMUTABLE = "public, max-age=31536000, immutable"
+# 不带版本号的地址每次使用前需用 ETag 重新验证
+REVALIDATE = "no-cache"
+
+
+def cache_control(requested_version: Optional[str], current_version: str) -> str:
+    """请求地址带有与当前内容一致的版本号时允许长期缓存"""
+    return IMMUTABLE if requested_version and requested_version == current_version else REVALIDATE
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """按 Accept-Encoding 选择压缩方式，优先 brotli"""
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+
+class CompressionMiddleware:
+    """
+    对 JSON/HTML 等文本响应按客户端支持做 brotli 或 gzip 压缩。
+
+    只处理状态码为 200 且尚未编码的可压缩类型，响应体完整缓冲后一次压缩，
+    text/event-stream 等流式类型不在压缩范围内。
+    """
+
+    def __init__(self, app, minimum_size: int = 500):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope.get('method') == 'HEAD':
+            await self.app(scope, receive, send)
+            return
+        headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+        encoding = negotiate_encoding(headers.get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        body = []
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message['type'] == 'http.response.start':
+                response_headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in message.get('headers', [])}
+                content_type = response_headers.get('content-type', '').split(';')[0].strip()
+                if (message['status'] == 200 and 'content-encoding' not in response_headers
+                        and content_type in COMPRESSIBLE_TYPES):
+                    start_message = message
+                    return
+                await send(message)
+            elif start_message is None:
+                await send(message)
+            else:
+                body.append(message.get('body', b''))
+                if message.get('more_body', False):
+                    return
+                await self._send_compressed(send, start_message, b''.join(body), encoding)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_compressed(self, send, start_message, data: bytes, encoding: str):
+        headers = [(k, v) for k, v in start_message['headers'] if k.lower() not in (b'content-length', b'vary', b'etag')]
+        etag = [v for k, v in start_message['headers'] if k.lower() == b'etag']
+        vary = [v for k, v in start_message['headers'] if k.lower() == b'vary']
+        vary_value = b', '.join(vary + [b'Accept-Encoding']) if b'accept-encoding' not in b','.join(vary).lower() \
+            else b', '.join(vary)
+        if len(data) >= self.minimum_size:
+            data = compress(data, encoding)
+            headers.append((b'content-encoding', encoding.encode('latin-1')))
+            # 压缩后字节与原文件不同，强 ETag 降级为弱 ETag
+            etag = [v if v.startswith(b'W/') else b'W/' + v for v in etag]
+        headers.extend((b'etag', v) for v in etag)
+        headers.append((b'vary', vary_value))
+        headers.append((b'content-length', str(len(data)).encode('latin-1')))
+        await send({**start_message, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': data})
@@ -0,0 +1,329 @@
+# live_feed.py
+"""
+实时行情推送。
+
+行情源（QuoteFeed）逐根产出新K线，LiveHub 为每个品种只运行一份增量计算，
+把 R-Breaker、RSI、MACD 的状态变化编码一次后分发给该品种的所有订阅者。
+订阅者各持有一个有界队列，消费过慢时丢弃最旧的消息，不会拖慢计算和其他订阅者。
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import zlib
+from collections import deque
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, NamedTuple, Optional, Set
+
+import pandas as pd
+
+import minute_bars
+import r_breaker
+
+# 行情代码只允许大写字母、数字和点，如 000001.SZ、IF2403.CFFEX
+SYMBOL_PATTERN = re.compile(r'[0-9A-Z.]+')
+
+ZONE_LABELS = (
+    '突破买入价之上',
+    '观察卖出价至突破买入价',
+    '反转卖出价至观察卖出价',
+    '反转买入价至反转卖出价',
+    '观察买入价至反转买入价',
+    '突破卖出价至观察买入价',
+    '突破卖出价之下',
+)
+
+
+class Bar(NamedTuple):
+    time: pd.Timestamp
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+class QuoteFeed(ABC):
+    """行情源接口：bars 按时间顺序逐根产出某品种的新K线"""
+
+    def has(self, symbol: str) -> bool:
+        return True
+
+    @abstractmethod
+    def bars(self, symbol: str) -> AsyncIterator[Bar]:
+        ...
+
+
+class ReplayFeed(QuoteFeed):
+    """回放本地分钟线文件（{代码}.csv 或 {代码}/ 目录），每根K线间隔 interval 秒，用于测试和演示"""
+
+    def __init__(self, directory: str, interval: float = 1.0):
+        self.directory = directory
+        self.interval = interval
+
+    def has(self, symbol: str) -> bool:
+        return self._path(symbol) is not None
+
+    async def bars(self, symbol: str) -> AsyncIterator[Bar]:
+        chunks = minute_bars.read_minute_source(self._path(symbol))
+        async for bar in _paced(chunks, self.interval):
+            yield bar
+
+    def _path(self, symbol: str) -> Optional[str]:
+        """代码对应的文件或目录，代码无效或解析后的路径不在 directory 之内时返回 None"""
+        if not valid_symbol(symbol):
+            return None
+        root = os.path.realpath(self.directory)
+        for path in (os.path.join(root, symbol), os.path.join(root, f"{symbol}.csv")):
+            # 符号链接可能指向目录之外，按解析后的真实路径检查
+            if os.path.exists(path) and os.path.commonpath([root, os.path.realpath(path)]) == root:
+                return path
+        return None
+
+
+class StubFeed(QuoteFeed):
+    """合成行情（随机游走的1分钟线），每个品种的序列由代码决定"""
+
+    def __init__(self, interval: float = 1.0, start: str = '2024-01-02', end: str = '2024-12-31'):
+        self.interval = interval
+        self.start = start
+        self.end = end
+
+    async def bars(self, symbol: str) -> AsyncIterator[Bar]:
+        chunks = minute_bars.stub_minute_feed(self.start, self.end, seed=zlib.crc32(symbol.encode('utf-8')))
+        async for bar in _paced(chunks, self.interval):
+            yield bar
+
+
+def valid_symbol(symbol: str) -> bool:
+    """代码只含大写字母、数字和点，且不是 . 或 .. 等纯点号路径"""
+    return bool(SYMBOL_PATTERN.fullmatch(symbol)) and symbol.strip('.') != ''
+
+
+async def _paced(chunks, interval: float) -> AsyncIterator[Bar]:
+    """在线程中读取下一块数据，块内按间隔逐根产出"""
+    iterator = iter(chunks)
+    while True:
+        chunk = await asyncio.to_thread(next, iterator, None)
+        if chunk is None:
+            return
+        volume = chunk['volume'] if 'volume' in chunk.columns else pd.Series(0.0, index=chunk.index)
+        for row in zip(chunk.index, chunk['open'], chunk['high'], chunk['low'], chunk['close'], volume):
+            yield Bar(*row)
+            await asyncio.sleep(interval)
+
+
+class IncrementalSignals:
+    """
+    逐根K线增量更新 EMA12/EMA26/DEA、RSI(14) 和日内 R-Breaker，每根K线 O(1)。
+
+    计算规则与 calculate_indicators 及 r_breaker.intraday_signals 一致；
+    日内持仓在每个交易日最后一个交易时段结束时（session_close）平仓。
+    """
+
+    def __init__(self, session_close: str = minute_bars.SESSIONS[-1][1],
+                 f1: float = 0.35, f2: float = 0.07, f3: float = 0.25):
+        self.session_close = pd.Timestamp(session_close).time()
+        self.params = (f1, f2, f3)
+        self.ema12 = self.ema26 = self.dea = None
+        self.prev_close = None
+        self.gains: deque = deque(maxlen=14)
+        self.losses: deque = deque(maxlen=14)
+
+        self.session = None
+        self.prev_day = None  # 上一交易日 (最高, 最低, 收盘)
+        self.day_high = self.day_low = math.nan
+        self.levels: Optional[Dict[str, float]] = None
+        self.position = 0
+        self.active = False
+        self.state: Dict = {}
+
+    def update(self, bar: Bar) -> Optional[Dict]:
+        """更新一根K线，状态有变化时返回事件，否则返回 None"""
+        new_levels = self._roll_session(bar.time)
+        self.day_high = max(self.day_high, bar.high) if not math.isnan(self.day_high) else bar.high
+        self.day_low = min(self.day_low, bar.low) if not math.isnan(self.day_low) else bar.low
+        self._update_oscillators(bar.close)
+        self._update_r_breaker(bar)
+
+        dif = self.ema12 - self.ema26
+        rsi = self._rsi()
+        state = {
+            'rb_position': self.position,
+            'rb_zone': self._zone(bar.close),
+            'rsi_status': None if math.isnan(rsi) else "超买" if rsi > 70 else "超卖" if rsi < 30 else "中性",
+            'macd_state': "多头" if dif > self.dea else "空头",
+        }
+        changes = [name for name, value in state.items() if self.state.get(name) != value]
+        if new_levels:
+            changes.append('rb_levels')
+        self.state = state
+        if not changes:
+            return None
+
+        event = {
+            'time': bar.time.isoformat(),
+            'close': round(float(bar.close), 4),
+            'changes': changes,
+            'state': state,
+            'rsi': None if math.isnan(rsi) else round(rsi, 2),
+            'dif': round(dif, 4),
+            'dea': round(self.dea, 4),
+        }
+        if new_levels:
+            event['levels'] = {name: round(value, 4) for name, value in self.levels.items()}
+        return event
+
+    def _roll_session(self, time: pd.Timestamp) -> bool:
+        """进入新交易日时以上一交易日的高低收计算价位并重置日内状态，返回价位是否更新"""
+        day = time.normalize()
+        if day == self.session:
+            return False
+        if self.session is not None:
+            self.prev_day = (self.day_high, self.day_low, self.prev_close)
+        self.session = day
+        self.day_high = self.day_low = math.nan
+        self.position = 0
+        self.active = False
+        if self.prev_day is None:
+            return False
+        computed = r_breaker.levels(*([value] for value in self.prev_day), *self.params)
+        self.levels = {name: float(computed[name][0]) for name in r_breaker.LEVEL_NAMES}
+        return True
+
+    def _update_oscillators(self, close: float) -> None:
+        if self.ema12 is None:
+            self.ema12 = self.ema26 = close
+            self.dea = 0.0
+        else:
+            self.ema12 += (close - self.ema12) * 2 / 13
+            self.ema26 += (close - self.ema26) * 2 / 27
+            self.dea += ((self.ema12 - self.ema26) - self.dea) * 2 / 10
+            delta = close - self.prev_close
+            self.gains.append(max(delta, 0.0))
+            self.losses.append(max(-delta, 0.0))
+        self.prev_close = close
+
+    def _rsi(self) -> float:
+        if len(self.gains) < self.gains.maxlen:
+            return math.nan
+        gain, loss = sum(self.gains), sum(self.losses)
+        if loss == 0:
+            return 100.0 if gain > 0 else math.nan
+        return 100 - 100 / (1 + gain / loss)
+
+    def _update_r_breaker(self, bar: Bar) -> None:
+        levels = self.levels
+        if levels is not None:
+            close = bar.close
+            break_long = close > levels['Break_Buy']
+            break_short = close < levels['Break_Sell']
+            reverse_long = self.day_low < levels['Observe_Buy'] and close > levels['Reverse_Buy']
+            reverse_short = self.day_high > levels['Observe_Sell'] and close < levels['Reverse_Sell']
+            self.active = self.active or break_long or break_short
+            direction = int(break_long or (reverse_long and not reverse_short and self.active)) - \
+                int(break_short or (reverse_short and not reverse_long and self.active))
+            if direction:
+                self.position = direction
+        if bar.time.time() >= self.session_close:
+            self.position = 0
+
+    def _zone(self, close: float) -> Optional[str]:
+        if self.levels is None:
+            return None
+        return ZONE_LABELS[sum(1 for name in r_breaker.LEVEL_NAMES if self.levels[name] >= close)]
+
+
+class LiveHub:
+    """按品种共享增量计算并分发状态变化"""
+
+    def __init__(self, feed: QuoteFeed, queue_size: int = 256):
+        self.feed = feed
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._latest: Dict[str, str] = {}
+        self.stats = {'bars': 0, 'events': 0, 'deliveries': 0, 'dropped': 0}
+
+    def new_queue(self) -> asyncio.Queue:
+        return asyncio.Queue(maxsize=self.queue_size)
+
+    def subscribe(self, symbol: str, queue: asyncio.Queue) -> None:
+        """订阅品种，立即收到该品种最新的状态；第一个订阅者到来时启动该品种的计算"""
+        if not valid_symbol(symbol):
+            raise ValueError(f"无效的代码: {symbol}")
+        if not self.feed.has(symbol):
+            raise ValueError(f"行情源中没有 {symbol}")
+        self._subscribers.setdefault(symbol, set()).add(queue)
+        if symbol in self._latest:
+            self._offer(queue, self._latest[symbol])
+        if symbol not in self._tasks:
+            self._tasks[symbol] = asyncio.create_task(self._run(symbol))
+
+    def unsubscribe(self, symbol: str, queue: asyncio.Queue) -> None:
+        """取消订阅，品种没有订阅者时停止计算"""
+        subscribers = self._subscribers.get(symbol)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[symbol]
+            self._latest.pop(symbol, None)
+            task = self._tasks.pop(symbol, None)
+            if task is not None:
+                task.cancel()
+
+    def is_subscribed(self, symbol: str, queue: asyncio.Queue) -> bool:
+        """行情结束后订阅者被移除，推送端据此在发完最后一条消息后关闭连接"""
+        return queue in self._subscribers.get(symbol, ())
+
+    def status(self) -> Dict:
+        return {
+            'symbols': len(self._tasks),
+            'subscribers': sum(len(s) for s in self._subscribers.values()),
+            **self.stats,
+        }
+
+    async def _run(self, symbol: str) -> None:
+        signals = IncrementalSignals()
+        try:
+            async for bar in self.feed.bars(symbol):
+                self.stats['bars'] += 1
+                event = signals.update(bar)
+                if event is not None:
+                    self._publish(symbol, json.dumps({'symbol': symbol, **event}, ensure_ascii=False))
+            self._close(symbol, json.dumps({'symbol': symbol, 'end': True}))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"{symbol} 行情计算失败: {e}")
+            self._close(symbol, json.dumps({'symbol': symbol, 'error': str(e)}, ensure_ascii=False))
+        finally:
+            if self._tasks.get(symbol) is asyncio.current_task():
+                del self._tasks[symbol]
+
+    def _publish(self, symbol: str, message: str) -> None:
+        # 消息只编码一次，逐个放入订阅者队列
+        self._latest[symbol] = message
+        self.stats['events'] += 1
+        for queue in self._subscribers.get(symbol, ()):
+            self._offer(queue, message)
+
+    def _close(self, symbol: str, message: str) -> None:
+        """行情结束或出错：发出最后一条消息后移除全部订阅者，之后的新订阅重新开始回放，不会向原有订阅者重复推送"""
+        self._publish(symbol, message)
+        self._subscribers.pop(symbol, None)
+        self._latest.pop(symbol, None)
+
+    def send(self, queue: asyncio.Queue, payload: Dict[str, Any]) -> None:
+        """向单个订阅者发送消息（如订阅错误），与推送共用丢弃最旧消息的策略"""
+        self._offer(queue, json.dumps(payload, ensure_ascii=False))
+
+    def _offer(self, queue: asyncio.Queue, message: str) -> None:
+        if queue.full():
+            queue.get_nowait()
+            self.stats['dropped'] += 1
+        queue.put_nowait(message)
+        self.stats['deliveries'] += 1
@@ -0,0 +1,183 @@
+# llm_client.py
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class LLMError(Exception):
+    """所有 LLM 服务均调用失败"""
+
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败达到阈值后熔断，冷却期内拒绝请求；
+    冷却结束后只放行一个试探请求，成功则恢复，失败则重新熔断。
+    """
+
+    def __init__(self, threshold: int = 3, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def abandon(self) -> None:
+        """请求未实际发出时归还试探名额"""
+        with self._lock:
+            self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+
+class LLMProvider:
+    """单个 OpenAI 兼容接口及其并发限制、超时和熔断状态"""
+
+    def __init__(self, name: str, url: str, api_key: str, model: str, max_concurrency: int = 4,
+                 timeout: float = 60.0, breaker_threshold: int = 3, breaker_cooldown: float = 30.0):
+        self.name = name
+        self.url = url
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+
+
+class LLMClient:
+    """
+    LLM 调用客户端。
+
+    复用 keep-alive 连接池；每个服务有独立的并发信号量和请求超时；
+    按配置顺序故障转移，hedge_delay 大于 0 时，若首个请求在该时间内未返回，
+    则并行向下一个服务发出对冲请求，取最先成功的结果；连续失败的服务会被熔断。
+    """
+
+    def __init__(self, providers: List[LLMProvider], hedge_delay: float = 0.0, temperature: float = 0.1):
+        if not providers:
+            raise ValueError("未配置任何 LLM 服务")
+        self.providers = providers
+        self.hedge_delay = hedge_delay
+        self.temperature = temperature
+
+        pool_size = sum(p.max_concurrency for p in providers)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(providers), pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="llm")
+
+    @classmethod
+    def from_settings(cls, settings) -> 'LLMClient':
+        """由配置构建：LLM_PROVIDERS 为空时使用 API_URL/OPENAI_API_KEY/MODEL_NAME 作为唯一服务"""
+        entries = settings.LLM_PROVIDERS or [{
+            "name": "default",
+            "url": settings.API_URL,
+            "api_key": settings.OPENAI_API_KEY,
+            "model": settings.MODEL_NAME,
+        }]
+        providers = [LLMProvider(
+            name=entry.get("name", f"provider{i}"),
+            url=entry["url"],
+            api_key=entry.get("api_key", settings.OPENAI_API_KEY),
+            model=entry.get("model", settings.MODEL_NAME),
+            max_concurrency=entry.get("max_concurrency", settings.LLM_MAX_CONCURRENCY),
+            timeout=entry.get("timeout", settings.LLM_TIMEOUT),
+            breaker_threshold=settings.LLM_BREAKER_THRESHOLD,
+            breaker_cooldown=settings.LLM_BREAKER_COOLDOWN,
+        ) for i, entry in enumerate(entries)]
+        return cls(providers, hedge_delay=settings.LLM_HEDGE_DELAY)
+
+    def complete(self, prompt: str) -> str:
+        """发送单轮对话请求，返回回复文本"""
+        remaining = iter(self.providers)
+        pending: Dict = {}
+        errors = []
+
+        def launch() -> bool:
+            # 熔断状态在真正发出请求前再判断，避免占用半开状态的试探名额
+            for provider in remaining:
+                if provider.breaker.allow():
+                    pending[self._executor.submit(self._call, provider, prompt)] = provider
+                    return True
+                errors.append(f"{provider.name}: 熔断中")
+            return False
+
+        launch()
+        can_hedge = self.hedge_delay > 0
+        while pending:
+            done, _ = wait(list(pending), timeout=self.hedge_delay if can_hedge else None,
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                # 对冲：已发出的请求超过对冲延迟仍未返回，并行请求下一个服务
+                can_hedge = launch()
+                if can_hedge:
+                    logging.info("LLM 请求超过对冲延迟，发出对冲请求")
+                continue
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    logging.warning(f"LLM 服务 {provider.name} 调用失败: {e}")
+                    errors.append(f"{provider.name}: {e}")
+            if not pending:
+                launch()
+        raise LLMError("; ".join(errors) or "未配置任何 LLM 服务")
+
+    def status(self) -> List[Dict]:
+        return [{"name": p.name, "model": p.model, "breaker": p.breaker.state} for p in self.providers]
+
+    def _call(self, provider: LLMProvider, prompt: str) -> str:
+        if not provider.semaphore.acquire(timeout=provider.timeout):
+            provider.breaker.abandon()
+            raise LLMError("并发已满，等待超时")
+        try:
+            response = self.session.post(
+                provider.url,
+                headers={"Authorization": f"Bearer {provider.api_key}"},
+                json={"model": provider.model, "messages": [{"role": "user", "content": prompt}],
+                      "temperature": self.temperature},
+                timeout=(min(10.0, provider.timeout), provider.timeout),
+            )
+            response.raise_for_status()
+            content = response.json()["choices"][0]["message"]["content"].strip()
+        except Exception:
+            provider.breaker.record_failure()
+            raise
+        finally:
+            provider.semaphore.release()
+        provider.breaker.record_success()
+        return content
@@ -1,19 +1,25 @@
+import time
+import asyncio
+import hashlib
 import json
 import logging
 import os
-from fastapi import FastAPI, HTTPException, Response
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
+import threading
+from typing import Dict, Union
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from concurrent.futures import ThreadPoolExecutor
-import uvicorn
-from analysis_service import AnalysisService
 from config import Settings
-from data_service import DataService
-from models import AnalysisRequest, AnalysisResponse
+from models import AnalysisRequest, AnalysisResponse, ReportRequest, ReportResponse
+from artifact_store import ArtifactStore
+from admission import AdmissionController, AdmissionRejected
+from http_cache import CompressionMiddleware, REVALIDATE, cache_control
 from datetime import date, datetime
-import tushare as ts
-import matplotlib.font_manager as fm
+
+# 模块级初始化（中间件、静态目录、产物存储）的起点，耗时记入 startup_timings["module"]
+_module_started = time.perf_counter()
 
 # 设置日志
 logging.basicConfig(level=logging.INFO)
@@ -27,28 +33,146 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-app.mount("/static", StaticFiles(directory="static"), name="static")
-app.mount("/output", StaticFiles(directory="output"), name="output")
-# 添加字体文件路径
-fm.fontManager.addfont(path='./static/fonts/simhei.ttf')
-
-# 初始化服务
-settings = Settings()
-data_service = DataService(settings.TUSHARE_TOKEN)
-analysis_service = AnalysisService(settings)
-executor = ThreadPoolExecutor(max_workers=5)
+# JSON/HTML 响应按 Accept-Encoding 压缩
+app.add_middleware(CompressionMiddleware, minimum_size=500)
 
 # 确保目录存在
 os.makedirs("output", exist_ok=True)
 os.makedirs("static/images", exist_ok=True)
 
+app.mount("/static", StaticFiles(directory="static"), name="static")
+
+executor = ThreadPoolExecutor(max_workers=5)
+# 分析产物存储，容量与存活时间在数据子系统初始化时按配置更新
+artifact_store = ArtifactStore("output")
+
+# 服务延迟初始化：tushare、pandas、matplotlib 等重量级模块在预热时才导入，
+# 使 /health 在进程启动后立即可用，/ready 在数据与绘图子系统就绪后返回 200
+settings = None
+data_service = None
+analysis_service = None
+live_hub = None
+admission = None
+_init_lock = threading.Lock()
+_plot_lock = threading.Lock()
+readiness = {"data": False, "plot": False}
+startup_timings = {}
+startup_errors = {}  # 子系统 -> 最近一次初始化失败原因
+
+
+def init_data_subsystem():
+    """初始化配置、共享缓存和数据服务"""
+    global settings, data_service
+    with _init_lock:
+        if data_service is not None:
+            return
+        started = time.perf_counter()
+        from data_service import DataService
+        from shared_cache import SharedBarCache
+
+        settings = settings or Settings()
+        artifact_store.max_bytes = settings.ARTIFACT_MAX_BYTES
+        artifact_store.max_age = settings.ARTIFACT_MAX_AGE
+        artifact_store.revalidate_after = settings.ARTIFACT_REVALIDATE_AFTER
+        shared_cache = SharedBarCache(settings.SHARED_CACHE_DIR, settings.SHARED_CACHE_TTL,
+                                      settings.SHARED_CACHE_MAX_MB * 2 ** 20) if settings.SHARED_CACHE_ENABLED else None
+        data_service = DataService(settings.TUSHARE_TOKEN, settings.DATA_CACHE_DIR, shared_cache, settings.MINUTE_DATA_DIR,
+                                   settings.MINUTE_MAX_SESSIONS)
+        startup_timings["data"] = round(time.perf_counter() - started, 3)
+        readiness["data"] = True
+
+
+def init_plot_subsystem():
+    """初始化分析服务，导入 matplotlib、注册中文字体并编译滚动统计内核"""
+    global settings, analysis_service
+    init_data_subsystem()
+    with _init_lock:
+        if analysis_service is not None:
+            return
+        started = time.perf_counter()
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.font_manager as fm
+        from analysis_service import AnalysisService
+        import rolling
+
+        # 添加字体文件路径
+        font_path = './static/fonts/simhei.ttf'
+        if os.path.exists(font_path):
+            fm.fontManager.addfont(path=font_path)
+        else:
+            logging.warning(f"字体文件不存在: {font_path}")
+        rolling.warm_up()
+        analysis_service = AnalysisService(settings)
+        startup_timings["plot"] = round(time.perf_counter() - started, 3)
+        readiness["plot"] = True
+
+
+def warm_up(attempts: int = 3, delay: float = 5.0):
+    """后台预热全部子系统，失败时记录原因（/ready 返回）并按递增间隔重试"""
+    for attempt in range(1, attempts + 1):
+        try:
+            init_plot_subsystem()
+            startup_errors.clear()
+            logging.info(f"服务预热完成: {startup_timings}")
+            return
+        except Exception as e:
+            failed = next((name for name, ready in readiness.items() if not ready), "plot")
+            startup_errors[failed] = f"{type(e).__name__}: {e}"
+            logging.error(f"服务预热失败（第 {attempt}/{attempts} 次）: {e}")
+            if attempt < attempts:
+                time.sleep(delay * attempt)
+
+
+@app.on_event("startup")
+async def schedule_warm_up():
+    artifact_store.scan()
+    # 预热放到线程池执行，不阻塞事件循环和健康检查
+    asyncio.get_running_loop().run_in_executor(executor, warm_up)
+
+
+def artifact_headers(request: Request, artifact) -> dict:
+    """产物缓存头：地址中的版本号与内容一致时长期缓存，否则要求重新验证"""
+    headers = artifact_store.headers(artifact)
+    headers["Cache-Control"] = cache_control(request.query_params.get("v"), artifact.version)
+    return headers
+
+
+class ArtifactFileResponse(FileResponse):
+    """产物文件在索引核对间隔内被其他 worker 淘汰时，移除索引条目并返回 404，而不是 500"""
+
+    def __init__(self, name: str, detail: str, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.name = name
+        self.detail = detail
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        except RuntimeError:
+            # FileResponse 在发送响应头之前探测文件，文件不存在时抛出 RuntimeError
+            if os.path.exists(self.path):
+                raise
+            artifact_store.invalidate(self.name)
+            await JSONResponse({"detail": self.detail}, status_code=404)(scope, receive, send)
+
+
+def artifact_response(request: Request, name: str, detail: str) -> Response:
+    """按产物索引返回文件，支持 ETag / Last-Modified 条件请求"""
+    artifact = artifact_store.get(name)
+    if artifact is None:
+        logging.error(f"产物未找到: {name}")
+        raise HTTPException(status_code=404, detail=detail)
+    headers = artifact_headers(request, artifact)
+    if artifact_store.is_not_modified(artifact, request.headers):
+        return Response(status_code=304, headers=headers)
+    headers["Access-Control-Allow-Origin"] = "*"
+    return ArtifactFileResponse(name, detail, artifact.path, media_type=artifact.content_type, headers=headers)
+
+
 @app.get("/output/{filename}")
-async def get_output_file(filename: str):
-    file_path = os.path.join("output", filename)
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(file_path)
+async def get_output_file(request: Request, filename: str):
+    return artifact_response(request, filename, "File not found")
 
 # 实施日期验证功能，确保请求的日期范围有效
 def validate_date_range(start_date: str, end_date: str) -> tuple[date, date]:
@@ -68,6 +192,7 @@ def validate_date_range(start_date: str, end_date: str) -> tuple[date, date]:
 
 # 检查期货合约在给定日期范围内是否有效
 def is_valid_futures_contract(symbol: str, start_date: date, end_date: date) -> bool:
+    import tushare as ts
     pro = ts.pro_api()
     today = date.today()
 
@@ -88,11 +213,8 @@ def is_valid_futures_contract(symbol: str, start_date: date, end_date: date) ->
 
 
 # 保存分析结果到 JSON 文件
-def save_json_analysis(symbol: str, start_date: str, end_date: str, analysis: str):
-    output_filename = f"./output/{symbol}_{start_date}_{end_date}_analysis.json"
-    
-    # 确保输出目录存在
-    os.makedirs("./output", exist_ok=True)
+async def save_json_analysis(symbol: str, start_date: str, end_date: str, analysis: Union[str, Dict[str, str]]):
+    output_filename = f"{symbol}_{start_date}_{end_date}_analysis.json"
     
     # 保存分析结果到 JSON
     analysis_result = {
@@ -103,58 +225,89 @@ def save_json_analysis(symbol: str, start_date: str, end_date: str, analysis: st
     }
     
     try:
-        with open(output_filename, "w", encoding="utf-8") as json_file:
-            json.dump(analysis_result, json_file, ensure_ascii=False, indent=4)
+        artifact = await artifact_store.put_json(output_filename, analysis_result)
         logging.info(f"JSON 文件成功保存至 {output_filename}")
+        return artifact
     except Exception as e:
         logging.error(f"保存 JSON 文件失败: {e}")
+        return None
+
+
+def versioned_url(url: str, artifact) -> str:
+    """附加内容版本号，内容变化时地址随之变化，浏览器可长期缓存"""
+    return f"{url}?v={artifact.version}" if artifact is not None else url
 
 
 @app.get("/")
-async def read_root():
-    return FileResponse("static/index.html")
+async def read_root(request: Request):
+    stat = os.stat("static/index.html")
+    etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE}
+    if etag in [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse("static/index.html", headers=headers)
+
+def prepare_analysis(request: AnalysisRequest, start_date: date, end_date: date) -> tuple:
+    """校验期货合约、获取数据并计算指标，返回 (分析提示, 图表 PNG)"""
+    # 对于期货合约，验证合约的有效性（同步调用 Tushare，须在线程池中执行）
+    if request.data_type == "期货":
+        if not is_valid_futures_contract(request.symbol, start_date, end_date):
+            raise ValueError(f"请求的日期范围 {start_date} 到 {end_date} 对于合约 {request.symbol} 无效")
+
+    # 获取数据
+    start, end = start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+    df = data_service.get_bars(request.symbol, start, end, request.data_type, request.timeframe, settings.BAR_FLOAT_DTYPE)
+
+    # 计算指标
+    df = analysis_service.calculate_indicators(df)
+
+    # 生成分析提示与图表
+    analysis_prompt = analysis_service.generate_analysis(df, request.symbol, start, end)
+    # pyplot 的当前图状态不是线程安全的，绘图逐个进行
+    with _plot_lock:
+        png = analysis_service.render_analysis_png(df, request.symbol)
+    return analysis_prompt, png
 
 # 数据分析异步处理
 async def analyze_data_async(request: AnalysisRequest) -> AnalysisResponse:
     try:
+        # 预热未完成时在线程池中等待初始化
+        if not all(readiness.values()):
+            await asyncio.get_running_loop().run_in_executor(executor, init_plot_subsystem)
+
         # 验证日期范围
         start_date, end_date = validate_date_range(request.start_date, request.end_date)
-        
-        # 对于期货合约，验证合约的有效性
-        if request.data_type == "期货":
-            if not is_valid_futures_contract(request.symbol, start_date, end_date):
-                raise ValueError(f"请求的日期范围 {start_date} 到 {end_date} 对于合约 {request.symbol} 无效")
-        
-        # 获取数据
-        df = data_service.get_data(request.symbol, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"), request.data_type)
-        
-        # 计算指标
-        df = analysis_service.calculate_indicators(df)
-        
-        # 生成分析提示
-        analysis_prompt = analysis_service.generate_analysis(df, request.symbol, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
-
-        # 创建输出目录
-        os.makedirs("./output", exist_ok=True)
-
-        # 生成图表
-        image_path = f"./output/{request.symbol}_{start_date}_{end_date}.png"
-        analysis_service.plot_analysis(df, request.symbol, image_path)
-
-        # 获取 GPT 分析结果
-        gpt_analysis = analysis_service.get_gpt_analysis(analysis_prompt)
+
+        # 合约校验、获取数据、计算指标、生成分析提示和图表均在线程池中执行，不阻塞事件循环（排队与 429 响应不受影响）
+        analysis_prompt, png = await asyncio.get_running_loop().run_in_executor(
+            executor, prepare_analysis, request, start_date, end_date)
+        image_artifact = None
+        if png is not None:
+            image_artifact = await artifact_store.put_bytes(f"{request.symbol}_{start_date}_{end_date}.png", png)
+
+        # 获取 GPT 分析结果，记录提示词规模与端到端耗时
+        from prompt_builder import estimate_tokens
+        prompt_tokens = estimate_tokens(analysis_prompt)
+        llm_started = time.perf_counter()
+        gpt_analysis = await asyncio.get_running_loop().run_in_executor(
+            executor, analysis_service.get_gpt_analysis, analysis_prompt)
+        llm_latency = round(time.perf_counter() - llm_started, 3)
+        logging.info(f"{request.symbol} 提示词 {len(analysis_prompt)} 字符 / 约 {prompt_tokens} tokens，LLM 耗时 {llm_latency}s")
 
         # 保存 JSON 分析结果
-        save_json_analysis(request.symbol, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"), gpt_analysis)
+        json_artifact = await save_json_analysis(request.symbol, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"), gpt_analysis)
 
         return AnalysisResponse(
             message=f"分析完成 {request.data_type} {request.symbol}",
-            image_path=f"/get_image/{request.symbol}_{start_date}_{end_date}.png",  # 使用相对路径
-            json_file_url=f"/get_json/{request.symbol}_{start_date}_{end_date}",    # 使用相对路径
+            image_path=versioned_url(f"/get_image/{request.symbol}_{start_date}_{end_date}.png", image_artifact),  # 使用相对路径
+            json_file_url=versioned_url(f"/get_json/{request.symbol}_{start_date}_{end_date}", json_artifact),    # 使用相对路径
             symbol=request.symbol,
             start_date=start_date.strftime("%Y-%m-%d"),
             end_date=end_date.strftime("%Y-%m-%d"),
-            analysis=gpt_analysis
+            analysis=gpt_analysis,
+            prompt_chars=len(analysis_prompt),
+            prompt_tokens=prompt_tokens,
+            llm_latency=llm_latency
         )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -163,52 +316,271 @@ async def analyze_data_async(request: AnalysisRequest) -> AnalysisResponse:
         raise HTTPException(status_code=500, detail=f"分析失败: {str(e)}")
 
 
+def get_admission():
+    """按配置创建准入控制器"""
+    global admission
+    if admission is None:
+        admission = AdmissionController(settings.ADMISSION_MAX_CONCURRENCY, settings.ADMISSION_MAX_QUEUE,
+                                        settings.ADMISSION_MAX_WAIT, settings.ADMISSION_CLIENT_RATE,
+                                        settings.ADMISSION_CLIENT_BURST)
+    return admission
+
+
+def client_id(request: Request) -> str:
+    if settings.ADMISSION_CLIENT_HEADER:
+        value = request.headers.get(settings.ADMISSION_CLIENT_HEADER)
+        if value:
+            return value.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def analysis_priority(request: AnalysisRequest) -> str:
+    """行情已在共享缓存中的请求不访问 Tushare，优先处理；日期无效时按 fresh 处理，由分析流程返回错误"""
+    try:
+        # 与 analyze_data_async 相同的日期规范化，保证与 get_bars 使用同一缓存键和区间
+        start, end = validate_date_range(request.start_date, request.end_date)
+        cached = data_service.has_cached_bars(request.symbol, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"),
+                                              request.data_type, request.timeframe, settings.BAR_FLOAT_DTYPE)
+    except Exception:
+        cached = False
+    return "cached" if cached else "fresh"
+
+
+async def admitted(http_request: Request, priority: str, handler):
+    """经准入控制后执行 handler，未被准入时返回 429 和 Retry-After"""
+    if not readiness["data"]:
+        await asyncio.get_running_loop().run_in_executor(executor, init_data_subsystem)
+    controller = get_admission()
+    try:
+        async with controller.slot(client_id(http_request), priority):
+            return await handler()
+    except AdmissionRejected as e:
+        logging.warning(f"拒绝请求 {http_request.url.path}（{e.reason}）: {client_id(http_request)}")
+        return JSONResponse(status_code=429, content={"detail": e.detail, "reason": e.reason},
+                            headers={"Retry-After": str(e.retry_after)})
+
+
 @app.post("/analyze/")
-async def analyze_data(request: AnalysisRequest):
-    return await analyze_data_async(request)
+async def analyze_data(request: AnalysisRequest, http_request: Request):
+    # 先初始化数据服务，再按共享缓存判断优先级
+    if not readiness["data"]:
+        await asyncio.get_running_loop().run_in_executor(executor, init_data_subsystem)
+    return await admitted(http_request, analysis_priority(request), lambda: analyze_data_async(request))
+
+
+def load_report_bars(request: ReportRequest, start: str, end: str) -> tuple:
+    """逐个品种获取数据并计算指标，返回 ([(代码, Bars)], {代码: 错误})"""
+    items, errors = [], {}
+    for symbol in request.symbols:
+        try:
+            bars = data_service.get_bars(symbol, start, end, request.data_type, request.timeframe, settings.BAR_FLOAT_DTYPE)
+            if len(bars) < 2:
+                raise ValueError(f"数据不足：{start} 至 {end} 只有 {len(bars)} 根K线，至少需要 2 根")
+            items.append((symbol, analysis_service.calculate_indicators(bars)))
+        except ValueError as e:
+            errors[symbol] = str(e)
+    return items, errors
+
+
+@app.post("/report/")
+async def generate_report(request: ReportRequest, http_request: Request):
+    """多品种报告：批量生成各品种分析，与 /analyze 共用准入控制，优先级最低"""
+    return await admitted(http_request, "report", lambda: generate_report_async(request))
+
+
+async def generate_report_async(request: ReportRequest) -> ReportResponse:
+    try:
+        if not all(readiness.values()):
+            await asyncio.get_running_loop().run_in_executor(executor, init_plot_subsystem)
+        start_date, end_date = validate_date_range(request.start_date, request.end_date)
+        start, end = start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+        loop = asyncio.get_running_loop()
+
+        items, errors = await loop.run_in_executor(executor, load_report_bars, request, start, end)
+        llm_started = time.perf_counter()
+        analyses = await loop.run_in_executor(executor, analysis_service.batch_narrate, items, start, end)
+        llm_latency = round(time.perf_counter() - llm_started, 3)
+        logging.info(f"报告 {len(items)} 个品种，LLM 耗时 {llm_latency}s")
+
+        report_name = "report-" + hashlib.sha1(",".join(sorted(analyses)).encode("utf-8")).hexdigest()[:8]
+        artifact = await save_json_analysis(report_name, start, end, analyses)
+        return ReportResponse(
+            message=f"报告完成 {len(analyses)} 个品种",
+            json_file_url=versioned_url(f"/get_json/{report_name}_{start}_{end}", artifact),
+            start_date=start,
+            end_date=end,
+            analyses=analyses,
+            errors=errors,
+            llm_latency=llm_latency
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"报告生成发生错误: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"报告生成失败: {str(e)}")
 
 
 @app.get("/get_image/{symbol}_{start_date}_{end_date}.png")
-async def get_image(symbol: str, start_date: str, end_date: str):
-    image_path = f"./output/{symbol}_{start_date}_{end_date}.png"
-    logging.info(f"Fetching image from {image_path}")
-    
-    if not os.path.exists(image_path):
-        logging.error(f"Image not found at {image_path}")
-        raise HTTPException(status_code=404, detail="图像未找到")
-    
-    return FileResponse(
-        image_path,
-        media_type="image/png",
-        headers={"Access-Control-Allow-Origin": "*"}
-    )
+async def get_image(request: Request, symbol: str, start_date: str, end_date: str):
+    logging.info(f"Fetching image {symbol}_{start_date}_{end_date}.png")
+    return artifact_response(request, f"{symbol}_{start_date}_{end_date}.png", "图像未找到")
 
 @app.get("/get_json/{symbol}_{start_date}_{end_date}")
-async def get_json(symbol: str, start_date: str, end_date: str):
-    json_filename = f"./output/{symbol}_{start_date}_{end_date}_analysis.json"
+async def get_json(request: Request, symbol: str, start_date: str, end_date: str):
+    json_filename = f"{symbol}_{start_date}_{end_date}_analysis.json"
     
     logging.info(f"尝试获取 JSON 文件: {json_filename}")
-    
-    if not os.path.exists(json_filename):
+
+    artifact = artifact_store.get(json_filename)
+    if artifact is None:
         logging.error(f"JSON 文件未找到: {json_filename}")
         raise HTTPException(status_code=404, detail="JSON 文件未找到")
-    
+    headers = artifact_headers(request, artifact)
+    if artifact_store.is_not_modified(artifact, request.headers):
+        return Response(status_code=304, headers=headers)
+
     try:
-        with open(json_filename, "r", encoding="utf-8") as json_file:
-            json_content = json.load(json_file)
-        logging.info(f"成功读取 JSON 文件: {json_filename}")
-        return json_content
-    except json.JSONDecodeError as e:
-        logging.error(f"JSON 文件解析错误: {json_filename}, 错误: {str(e)}")
-        raise HTTPException(status_code=500, detail="JSON 文件解析错误")
+        content = await artifact_store.read_bytes(json_filename)
     except Exception as e:
         logging.error(f"读取 JSON 文件时发生未知错误: {json_filename}, 错误: {str(e)}")
         raise HTTPException(status_code=500, detail="读取 JSON 文件时发生错误")
+    if content is None:
+        raise HTTPException(status_code=404, detail="JSON 文件未找到")
+    # 直接返回已序列化的字节，不再解析后重新编码
+    return Response(content=content, media_type="application/json", headers=headers)
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
 
+def get_live_hub():
+    """首次订阅时按配置创建行情源和 LiveHub"""
+    global live_hub
+    if live_hub is None:
+        from live_feed import LiveHub, ReplayFeed, StubFeed
+
+        init_data_subsystem()
+        if settings.LIVE_FEED == "stub":
+            feed = StubFeed(settings.LIVE_REPLAY_INTERVAL)
+        else:
+            feed = ReplayFeed(settings.MINUTE_DATA_DIR, settings.LIVE_REPLAY_INTERVAL)
+        live_hub = LiveHub(feed, settings.LIVE_QUEUE_SIZE)
+    return live_hub
+
+
+@app.get("/stream/{symbol}")
+async def stream_quotes(symbol: str, request: Request):
+    """SSE 推送单个品种的 R-Breaker/RSI/MACD 状态变化"""
+    if not readiness["data"]:
+        await asyncio.get_running_loop().run_in_executor(executor, init_data_subsystem)
+    hub = get_live_hub()
+    symbol = symbol.strip().upper()
+    queue = hub.new_queue()
+    try:
+        hub.subscribe(symbol, queue)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    async def events():
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=15)
+                    yield f"data: {message}\n\n"
+                    if queue.empty() and not hub.is_subscribed(symbol, queue):
+                        break  # 行情已结束（最后一条为 end 或 error 消息），关闭推送
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+        finally:
+            hub.unsubscribe(symbol, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.websocket("/ws/quotes")
+async def quotes_socket(websocket: WebSocket):
+    """
+    WebSocket 推送状态变化，一个连接可订阅多个品种：
+    客户端发送 {"subscribe": ["000001.SZ"]} 或 {"unsubscribe": [...]}
+    """
+    await websocket.accept()
+    if not readiness["data"]:
+        await asyncio.get_running_loop().run_in_executor(executor, init_data_subsystem)
+    hub = get_live_hub()
+    queue = hub.new_queue()
+    symbols = set()
+
+    async def pump():
+        while True:
+            await websocket.send_text(await queue.get())
+
+    sender = asyncio.create_task(pump())
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                hub.send(queue, {"error": '消息格式应为 JSON 对象，如 {"subscribe": ["000001.SZ"]}'})
+                continue
+            for action in ("subscribe", "unsubscribe"):
+                names = message.get(action, [])
+                if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+                    hub.send(queue, {"error": f"{action} 应为代码字符串列表"})
+                    continue
+                for symbol in (name.strip().upper() for name in names):
+                    if action == "unsubscribe":
+                        hub.unsubscribe(symbol, queue)
+                        symbols.discard(symbol)
+                        continue
+                    try:
+                        hub.subscribe(symbol, queue)
+                        symbols.add(symbol)
+                    except ValueError as e:
+                        hub.send(queue, {"symbol": symbol, "error": str(e)})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        for symbol in symbols:
+            hub.unsubscribe(symbol, queue)
+
+
+@app.get("/ready")
+async def readiness_check():
+    """就绪探针：数据与绘图子系统均已预热时返回 200，否则返回 503，预热失败时附带原因"""
+    ready = all(readiness.values())
+    # 预热失败后请求触发的按需初始化可能已成功，只报告仍未就绪的子系统
+    errors = {name: error for name, error in startup_errors.items() if not readiness.get(name)}
+    status = "ready" if ready else "failed" if errors else "warming"
+    content = {"status": status, "subsystems": readiness, "timings": startup_timings}
+    if errors:
+        content["errors"] = errors
+    if analysis_service is not None:
+        content["llm"] = analysis_service.llm_client.status()
+    if live_hub is not None:
+        content["live"] = live_hub.status()
+    if admission is not None:
+        content["admission"] = admission.status()
+    return JSONResponse(content=content, status_code=200 if ready else 503)
+
+
+@app.get("/admission")
+async def admission_status():
+    """准入控制指标：运行与排队数、预计排队时间、各类拒绝次数"""
+    if admission is None:
+        return {"status": "idle"}
+    return admission.status()
+
+
+startup_timings["module"] = round(time.perf_counter() - _module_started, 3)
+
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
\ No newline at end of file
@@ -1,12 +1,24 @@
 # models.py
-from pydantic import BaseModel, Field, constr
-# from typing import Dict
+from pydantic import BaseModel, Field, ValidationInfo, constr, field_validator
+from typing import Dict, List, Optional
+
+FUTURES_TYPES = ('futures', '期货')
+
+
+def default_timeframe(timeframe: Optional[str], info: ValidationInfo) -> str:
+    """未指定周期时期货默认周线（与原先获取期货周线一致），股票和指数默认日线"""
+    if timeframe:
+        return timeframe
+    return 'W' if info.data.get('data_type') in FUTURES_TYPES else 'D'
 
 class AnalysisRequest(BaseModel):
     symbol: str
     start_date: str
     end_date: str
     data_type: str
+    timeframe: Optional[str] = Field(None, validate_default=True)  # D/W/M 或 Nmin，由本地日线/分钟线聚合；为空时按数据类型取默认值
+
+    resolve_timeframe = field_validator('timeframe')(default_timeframe)
 
 class AnalysisResponse(BaseModel):
     message: str
@@ -15,4 +27,25 @@ class AnalysisResponse(BaseModel):
     symbol: str
     start_date: str
     end_date: str
-    analysis: str
\ No newline at end of file
+    analysis: str
+    prompt_chars: int = 0  # 分析提示字符数
+    prompt_tokens: int = 0  # 分析提示 token 数（本地估算）
+    llm_latency: float = 0.0  # LLM 请求端到端耗时（秒）
+
+class ReportRequest(BaseModel):
+    symbols: List[str]
+    start_date: str
+    end_date: str
+    data_type: str
+    timeframe: Optional[str] = Field(None, validate_default=True)
+
+    resolve_timeframe = field_validator('timeframe')(default_timeframe)
+
+class ReportResponse(BaseModel):
+    message: str
+    json_file_url: str
+    start_date: str
+    end_date: str
+    analyses: Dict[str, str]  # 代码 -> 分析
+    errors: Dict[str, str] = {}  # 代码 -> 数据获取失败原因
+    llm_latency: float = 0.0  # 报告生成的 LLM 总耗时（秒）
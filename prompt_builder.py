@@ -0,0 +1,136 @@
+# prompt_builder.py
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken 为可选依赖，未安装时使用本地估算
+    _encoding = None
+
+VERBOSITY_LEVELS = ('brief', 'standard', 'detailed')
+
+_CJK = re.compile(r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+_WORD = re.compile(r'[A-Za-z]+|\d+|[^\sA-Za-z\d\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+
+INSTRUCTIONS = {
+    'brief': [
+        "请给出趋势判断、关键价位、操作建议（含止损）和主要风险，简明扼要。",
+    ],
+    'standard': [
+        "请输出：1.趋势评估（短/中/长期，EMA交叉） 2.指标解读（MACD强度、RSI、布林带位置） "
+        "3.量价关系 4.支撑阻力及突破可能 5.波动与风险控制 6.R-Breaker操作建议（入场/出场） "
+        "7.短期(1-3天)与中期(1-4周)策略 8.未来5日展望及需调整策略的情形。",
+        "要求客观、具体、可操作。",
+    ],
+    'detailed': [
+        "请逐项分析：",
+        "1.总体趋势：结合价格与EMA26的位置及EMA12/EMA26交叉，评估短期、中期和长期趋势。",
+        "2.技术指标：解读MACD信号的强度与可能持续时间、RSI所处状态对后市的影响、价格在布林带中的位置及突破或回归的可能。",
+        "3.成交量：分析成交量变化对价格走势的潜在影响。",
+        "4.支撑与阻力：分析突破支撑位、阻力位的可能性及影响。",
+        "5.波动性：分析波动率和ATR水平对交易策略的影响。",
+        "6.R-Breaker：根据信号给出具体操作建议，包括入场点和出场点。",
+        "7.风险评估：评估主要风险因素，给出风险控制建议和止损位置。",
+        "8.交易策略：给出短期（1-3天）和中长期（1-4周）的策略建议。",
+        "9.未来展望：分析影响未来5个交易日价格的技术面和基本面因素。",
+        "请确保分析全面、客观，并说明在哪些情况下需要调整策略。",
+    ],
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 数。
+
+    安装了 tiktoken 时使用 cl100k_base 编码精确计数；否则按经验规则估算：
+    每个中日韩字符及全角标点约 1 个 token，英文单词约 1 个 token，
+    数字每 3 位约 1 个 token，其余符号各 1 个 token。
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    count = len(_CJK.findall(text))
+    for token in _WORD.findall(text):
+        count += math.ceil(len(token) / 3) if token.isdigit() else 1
+    return count
+
+
+class PromptBuilder:
+    """
+    分析提示词构建器。
+
+    每项指标只出现一次，行首不带缩进；说明部分按 brief/standard/detailed 三档详略输出。
+    超出 token 预算时依次降低说明详略、去掉次要指标行，直至满足预算。
+    """
+
+    def __init__(self, verbosity: str = 'standard', token_budget: Optional[int] = None):
+        if verbosity not in VERBOSITY_LEVELS:
+            raise ValueError(f"不支持的详略级别: {verbosity}，可选 {'/'.join(VERBOSITY_LEVELS)}")
+        self.verbosity = verbosity
+        self.token_budget = token_budget
+
+    def build(self, metrics: Dict, symbol: str, start_date: str, end_date: str) -> str:
+        header = f"请基于以下数据分析 {symbol}（{start_date} 至 {end_date}）："
+        primary, secondary = self._data_lines(metrics)
+
+        levels = VERBOSITY_LEVELS[:VERBOSITY_LEVELS.index(self.verbosity) + 1][::-1]
+        candidates: List[Tuple[List[str], str]] = [(primary + secondary, level) for level in levels]
+        candidates.append((primary, 'brief'))
+
+        prompt = ""
+        for data_lines, level in candidates:
+            prompt = "\n".join([header] + data_lines + INSTRUCTIONS[level])
+            if self.token_budget is None or estimate_tokens(prompt) <= self.token_budget:
+                break
+        return prompt
+
+    def build_batch(self, items: List[Tuple[str, Dict]], start_date: str, end_date: str) -> str:
+        """
+        多品种批量提示词：共享一份说明，各品种数据块以 "### 代码" 分节，
+        并要求回复按同样的分节输出，便于逐品种解析。
+        """
+        lines = [
+            f"请基于以下数据分别分析 {len(items)} 个品种（{start_date} 至 {end_date}）。",
+            "回复时每个品种单独一节，节标题为单独一行的“### 代码”，顺序与下方一致，节内不要再使用###。",
+        ]
+        lines += INSTRUCTIONS[self.verbosity]
+        for symbol, metrics in items:
+            primary, secondary = self._data_lines(metrics)
+            lines.append(f"### {symbol}")
+            lines += primary if self.verbosity == 'brief' else primary + secondary
+        return "\n".join(lines)
+
+    @staticmethod
+    def _data_lines(m: Dict) -> Tuple[List[str], List[str]]:
+        """返回 (核心指标行, 次要指标行)"""
+        primary = [
+            f"价格 {m['last_price']:.2f}（{m['price_change']:+.2f}%），{m['trend']}趋势",
+            f"成交量 {m['last_volume']:.0f}（{m['volume_change']:+.2f}%），均量 {m['avg_volume']:.0f}，{m['volume_trend']}",
+            f"年化波动率 {m['volatility']:.2f}%（{m['volatility_level']}），"
+            f"ATR {m['atr']:.2f}（{'高于' if m['atr'] > m['atr_threshold'] else '低于'}阈值 {m['atr_threshold']:.2f}）",
+            f"支撑 {m['channel_lower']:.2f}（{'接近' if m['near_support'] else '远离'}），"
+            f"阻力 {m['channel_upper']:.2f}（{'接近' if m['near_resistance'] else '远离'}）",
+            f"MACD {m['macd']:.4f}（{m['macd_signal']}），DIF {m['dif']:.4f}，DEA {m['dea']:.4f}",
+            f"RSI {m['rsi']:.2f}（{m['rsi_status']}）",
+            f"R-Breaker：{m['r_breaker_signal']}",
+        ]
+        secondary = [
+            f"EMA12 {m['ema12']:.2f}，EMA26 {m['ema26']:.2f}",
+            f"布林带 上{m['boll_upper']:.2f} 中{m['boll_mid']:.2f} 下{m['boll_lower']:.2f}",
+            f"参考止损 {m['stop_loss']:.2f}，止盈 {m['take_profit']:.2f}，"
+            f"5日区间 {m['range_low']:.2f}-{m['range_high']:.2f}",
+        ]
+        return primary, secondary
+
+
+def parse_batch_response(text: str, symbols: List[str]) -> Dict[str, str]:
+    """按 "### 代码" 分节解析批量回复，只返回内容非空且属于请求品种的分节"""
+    wanted = {symbol.upper(): symbol for symbol in symbols}
+    parts = re.split(r'^[ \t]*#{2,4}[ \t]*\**([A-Za-z0-9.]+)\**[ \t]*$', text, flags=re.M)
+    sections = {}
+    for title, body in zip(parts[1::2], parts[2::2]):
+        symbol = wanted.get(title.upper())
+        if symbol is not None and body.strip():
+            sections[symbol] = body.strip()
+    return sections
@@ -0,0 +1,133 @@
+# r_breaker.py
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 六个价位，由高到低
+LEVEL_NAMES = ('Break_Buy', 'Observe_Sell', 'Reverse_Sell', 'Reverse_Buy', 'Observe_Buy', 'Break_Sell')
+
+LEVEL_LABELS = {
+    'Break_Buy': '突破买入价',
+    'Observe_Sell': '观察卖出价',
+    'Reverse_Sell': '反转卖出价',
+    'Reverse_Buy': '反转买入价',
+    'Observe_Buy': '观察买入价',
+    'Break_Sell': '突破卖出价',
+}
+
+
+def levels(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+           f1: float = 0.35, f2: float = 0.07, f3: float = 0.25) -> Dict[str, np.ndarray]:
+    """
+    由每根K线的最高、最低、收盘价计算供下一根K线使用的六个价位。
+
+    f1 决定观察价距离，f2 决定反转价距离，f3 决定突破价在观察价之外的距离。
+    """
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    observe_sell = high + f1 * (close - low)
+    observe_buy = low - f1 * (high - close)
+    return {
+        'Pivot': (high + low + close) / 3,
+        'Break_Buy': observe_sell + f3 * (observe_sell - observe_buy),
+        'Observe_Sell': observe_sell,
+        'Reverse_Sell': (1 + f2) / 2 * (high + close) - f2 * low,
+        'Reverse_Buy': (1 + f2) / 2 * (low + close) - f2 * high,
+        'Observe_Buy': observe_buy,
+        'Break_Sell': observe_buy - f3 * (observe_sell - observe_buy),
+    }
+
+
+def signals(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+            f1: float = 0.35, f2: float = 0.07, f3: float = 0.25) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray]:
+    """
+    对整段历史逐K线计算 R-Breaker 价位、信号和持仓，全部为数组运算。
+
+    规则（以收盘价为成交价）：
+    - 突破：收盘价高于突破买入价做多，低于突破卖出价做空；
+    - 反转：最高价越过观察卖出价且收盘回落到反转卖出价之下做空，
+      最低价跌破观察买入价且收盘回升到反转买入价之上做多；
+    - 空仓时只接受突破信号，持仓后不再平仓，只在反向信号出现时反手。
+
+    返回 (价位, 信号, 持仓)：价位取自上一根K线，首根为 NaN；
+    信号在持仓方向改变的K线上为 +1/-1，其余为 0；持仓为 +1/-1/0。
+    """
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    current = {}
+    for name, values in levels(high, low, close, f1, f2, f3).items():
+        current[name] = np.concatenate(([np.nan], values[:-1]))
+
+    break_long = close > current['Break_Buy']
+    break_short = close < current['Break_Sell']
+    reverse_long = (low < current['Observe_Buy']) & (close > current['Reverse_Buy'])
+    reverse_short = (high > current['Observe_Sell']) & (close < current['Reverse_Sell'])
+
+    # 首次突破之前处于空仓，反转信号无效；此后持仓只会在多空之间切换，
+    # 因此持仓等于最近一次有效信号方向的前向填充
+    breakouts = np.flatnonzero(break_long | break_short)
+    active = np.arange(len(close)) >= (breakouts[0] if len(breakouts) else len(close))
+    want_long = break_long | (reverse_long & ~reverse_short & active)
+    want_short = break_short | (reverse_short & ~reverse_long & active)
+    direction = want_long.astype(np.int8) - want_short.astype(np.int8)
+
+    filled = np.maximum.accumulate(np.where(direction != 0, np.arange(len(close)), -1))
+    position = np.where(filled >= 0, direction[np.maximum(filled, 0)], 0).astype(np.int8)
+    previous = np.concatenate(([0], position[:-1])).astype(np.int8)
+    signal = np.where(position != previous, position, 0).astype(np.int8)
+    return current, signal, position
+
+
+def intraday_signals(high: np.ndarray, low: np.ndarray, close: np.ndarray, session: np.ndarray,
+                     prev_day: Optional[Tuple[float, float, float]] = None,
+                     f1: float = 0.35, f2: float = 0.07, f3: float = 0.25
+                     ) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray]:
+    """
+    分钟线日内 R-Breaker，session 为每根K线所属交易日（须已按时间排序）。
+
+    价位取自上一交易日的日线最高、最低、收盘价，数据中第一个交易日使用 prev_day，
+    未提供时为 NaN。反转条件使用当日截至当前K线的最高/最低价；
+    每个交易日开盘空仓，只接受突破信号开仓，最后一根K线平仓。
+
+    返回 (价位, 信号, 持仓)，含义与 signals 相同。
+    """
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    session = np.asarray(session)
+    n = len(close)
+    if n == 0:
+        empty = np.zeros(0, dtype=np.int8)
+        return {name: np.zeros(0) for name in ('Pivot',) + LEVEL_NAMES}, empty, empty
+
+    starts = np.flatnonzero(np.r_[True, session[1:] != session[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    day = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, n]))
+
+    # 每个交易日的价位来自前一交易日
+    day_levels = levels(np.maximum.reduceat(high, starts), np.minimum.reduceat(low, starts), close[ends], f1, f2, f3)
+    first = levels(*(np.array([v], dtype=np.float64) for v in prev_day), f1, f2, f3) if prev_day is not None else None
+    current = {}
+    for name, values in day_levels.items():
+        head = first[name] if first is not None else [np.nan]
+        current[name] = np.concatenate((head, values[:-1]))[day]
+
+    index = np.arange(n)
+    session_high = pd.Series(high).groupby(day).cummax().to_numpy()
+    session_low = pd.Series(low).groupby(day).cummin().to_numpy()
+    break_long = close > current['Break_Buy']
+    break_short = close < current['Break_Sell']
+    reverse_long = (session_low < current['Observe_Buy']) & (close > current['Reverse_Buy'])
+    reverse_short = (session_high > current['Observe_Sell']) & (close < current['Reverse_Sell'])
+
+    # 每个交易日首次突破之后反转信号才有效，持仓在交易日内前向填充
+    first_break = np.minimum.reduceat(np.where(break_long | break_short, index, n), starts)[day]
+    active = index >= first_break
+    want_long = break_long | (reverse_long & ~reverse_short & active)
+    want_short = break_short | (reverse_short & ~reverse_long & active)
+    direction = want_long.astype(np.int8) - want_short.astype(np.int8)
+
+    filled = np.maximum.accumulate(np.where(direction != 0, index, -1))
+    position = np.where(filled >= starts[day], direction[np.maximum(filled, 0)], 0).astype(np.int8)
+    position[ends] = 0
+    previous = np.concatenate(([0], position[:-1])).astype(np.int8)
+    previous[starts] = 0
+    signal = np.where(position != previous, position, 0).astype(np.int8)
+    return current, signal, position
@@ -0,0 +1,118 @@
+# resampler.py
+import re
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+# 各字段的聚合方式，未列出的字段取区间最后一个值
+AGGREGATIONS = {
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'settle': 'last',
+    'pre_close': 'first',
+    'pre_settle': 'first',
+    'volume': 'sum',
+    'amount': 'sum',
+    'oi': 'last',
+    'oi_chg': 'sum',
+    'change': 'sum',
+    'price_change': 'sum',
+    'settle_change': 'sum',
+    'is_roll': 'any',
+}
+
+TIMEFRAMES = ('D', 'W', 'M')
+
+# 相邻分钟线间隔超过该分钟数视为休市（期货上午小节休息为 15 分钟），不计入经过时间
+BREAK_MINUTES = 15
+
+
+def parse_timeframe(timeframe: str) -> Tuple[str, int]:
+    """
+    解析周期参数。
+
+    支持 'D'(日线)、'W'(周线)、'M'(月线) 以及 'Nmin'(N分钟线，例如 '5min'、'60min')，
+    返回 (周期类型, 分钟数)。
+    """
+    timeframe = timeframe.strip()
+    if timeframe.upper() in TIMEFRAMES:
+        return timeframe.upper(), 0
+    match = re.fullmatch(r'(\d+)\s*(min|m)', timeframe, flags=re.IGNORECASE)
+    if match and int(match.group(1)) > 0:
+        return 'min', int(match.group(1))
+    raise ValueError(f"不支持的周期: {timeframe}，可选 D/W/M/Nmin")
+
+
+def is_intraday(df: pd.DataFrame) -> bool:
+    """判断数据是否为分钟级（同一天存在多根K线）"""
+    return len(df) > 1 and df.index.normalize().duplicated().any()
+
+
+def resample_bars(df: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+    """
+    将日线或分钟线聚合为更大周期的K线，数据需以时间为索引且已排序。
+
+    周线/月线按自然周(周一至周日)/自然月分组，索引取区间内最后一个交易时间，
+    不会产生节假日的空K线；N分钟线按开盘以来经过的交易分钟数分组，
+    缺失的K线不会使后续分组错位，休市时段不计时，因此不会跨日。
+    """
+    kind, minutes = parse_timeframe(timeframe)
+    intraday = is_intraday(df)
+
+    if df.empty:
+        return df
+    if kind == 'min':
+        if not intraday:
+            raise ValueError(f"{timeframe} 周期需要分钟线数据，当前数据为日线")
+        if 'trade_date' in df.columns:
+            session = df['trade_date'].to_numpy()
+        else:
+            session = df.index.normalize()
+        keys = [session, _session_minutes(df.index, session) // minutes]
+    elif kind == 'D':
+        if not intraday:
+            return df
+        keys = [df['trade_date'].to_numpy() if 'trade_date' in df.columns else df.index.normalize()]
+    elif kind == 'W':
+        keys = [df.index.to_period('W-SUN')]
+    else:
+        keys = [df.index.to_period('M')]
+
+    agg = {column: AGGREGATIONS.get(column, 'last') for column in df.columns}
+    bars = df.groupby(keys, sort=False).agg(agg)
+    stamps = pd.Series(df.index, index=df.index).groupby(keys, sort=False).last()
+    bars.index = pd.DatetimeIndex(stamps.to_numpy(), name=df.index.name)
+
+    if 'pct_chg' in bars.columns and 'pre_close' in bars.columns:
+        bars['pct_chg'] = (bars['close'] / bars['pre_close'] - 1) * 100
+    return bars
+
+
+def _session_minutes(index: pd.DatetimeIndex, session) -> np.ndarray:
+    """
+    每根K线距所属交易日开盘经过的交易分钟数。
+
+    按时钟计时，K线缺失造成的空档照常计入；间隔超过 BREAK_MINUTES 的休市（午休、夜盘与日盘之间）
+    只按一根K线的间隔计入，午后第一根K线接着上午的最后一根计数。
+    开盘时间取各交易日首根K线最常见的时刻，开盘后一段K线缺失的交易日仍按该时刻对齐。
+    """
+    clock = index.to_numpy().astype('datetime64[m]').astype(np.int64)
+    gaps = np.diff(clock, prepend=clock[:1])
+    positive = gaps[gaps > 0]
+    step = positive.min() if len(positive) else 1
+    gaps = np.where(gaps > BREAK_MINUTES, step, gaps)
+
+    session = np.asarray(session)
+    opens = np.ones(len(clock), dtype=bool)
+    opens[1:] = session[1:] != session[:-1]
+    first_minute = clock[opens] % 1440
+    minutes, counts = np.unique(first_minute, return_counts=True)
+    usual_open = minutes[counts.argmax()]
+    gaps[opens] = np.where(first_minute > usual_open, first_minute - usual_open, 0)
+
+    elapsed = np.cumsum(gaps)
+    first = np.maximum.accumulate(np.where(opens, np.arange(len(clock)), 0))
+    return elapsed - elapsed[first] + gaps[first]
@@ -0,0 +1,238 @@
+# rolling.py
+"""
+滚动统计内核。
+
+同一输入的多个窗口（或多个 EMA 周期）在一次遍历中同时计算：
+- rolling_mean_std：Welford 增量更新的滚动均值与标准差，每 w 步精确重算一次窗口；
+- rolling_extrema / rolling_high_low：单调双端队列的滚动最大/最小值，后者一次遍历得到最高价的最大值和最低价的最小值；
+- ema / ema_chain：多周期并行 EMA 与级联 EMA。
+
+结果与 pandas 的 rolling(window).mean()/std()/max()/min() 及 ewm(span) 一致：
+窗口内含 NaN 或数据不足时为 NaN，EMA 按 pandas 规则跳过缺失值。
+安装 numba 时内核即时编译；未安装时退回逐个调用 pandas。
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+except ImportError:  # numba 为可选依赖，未安装时使用 pandas 实现
+    njit = None
+
+
+def rolling_mean(x, windows: Sequence[int]) -> Dict[int, np.ndarray]:
+    """多窗口滚动均值"""
+    return {w: mean for w, (mean, _) in rolling_mean_std(x, windows, with_std=False).items()}
+
+
+def rolling_mean_std(x, windows: Sequence[int], ddof: int = 1,
+                     with_std: bool = True) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """多窗口滚动均值与标准差，返回 {窗口: (均值, 标准差)}；with_std=False 时标准差为 None"""
+    values = _as_float(x)
+    windows = _check_windows(windows)
+    if njit is None:
+        series = pd.Series(values)
+        return {w: (series.rolling(w).mean().to_numpy(),
+                    series.rolling(w).std(ddof=ddof).to_numpy() if with_std else None) for w in windows}
+    means, stds = _mean_std_kernel(values, np.asarray(windows, dtype=np.int64), ddof)
+    return {w: (means[i], stds[i] if with_std else None) for i, w in enumerate(windows)}
+
+
+def rolling_extrema(x, windows: Sequence[int]) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """多窗口滚动最大值与最小值，返回 {窗口: (最大值, 最小值)}"""
+    values = _as_float(x)
+    windows = _check_windows(windows)
+    if njit is None:
+        series = pd.Series(values)
+        return {w: (series.rolling(w).max().to_numpy(), series.rolling(w).min().to_numpy()) for w in windows}
+    highs, lows = _extrema_kernel(values, values, np.asarray(windows, dtype=np.int64))
+    return {w: (highs[i], lows[i]) for i, w in enumerate(windows)}
+
+
+def rolling_high_low(high, low, windows: Sequence[int]) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """high 的滚动最大值与 low 的滚动最小值，一次遍历完成，返回 {窗口: (最大值, 最小值)}"""
+    high, low = _as_float(high), _as_float(low)
+    if len(high) != len(low):
+        raise ValueError(f"high 与 low 长度不一致: {len(high)} != {len(low)}")
+    windows = _check_windows(windows)
+    if njit is None:
+        high_series, low_series = pd.Series(high), pd.Series(low)
+        return {w: (high_series.rolling(w).max().to_numpy(), low_series.rolling(w).min().to_numpy()) for w in windows}
+    highs, lows = _extrema_kernel(high, low, np.asarray(windows, dtype=np.int64))
+    return {w: (highs[i], lows[i]) for i, w in enumerate(windows)}
+
+
+def ema(x, spans: Sequence[float], adjust: bool = False) -> Dict[float, np.ndarray]:
+    """同一序列的多周期 EMA，返回 {周期: EMA}"""
+    values = _as_float(x)
+    if njit is None:
+        series = pd.Series(values)
+        return {span: series.ewm(span=span, adjust=adjust).mean().to_numpy() for span in spans}
+    out = _ema_kernel(values, _alphas(spans), adjust, False)
+    return {span: out[i] for i, span in enumerate(spans)}
+
+
+def ema_chain(x, spans: Sequence[float], adjust: bool = False) -> List[np.ndarray]:
+    """级联 EMA：第 k 个结果是第 k-1 个结果的 EMA，等价于依次调用 ewm(span).mean()"""
+    values = _as_float(x)
+    if njit is None:
+        out, series = [], pd.Series(values)
+        for span in spans:
+            series = series.ewm(span=span, adjust=adjust).mean()
+            out.append(series.to_numpy())
+        return out
+    return list(_ema_kernel(values, _alphas(spans), adjust, True))
+
+
+def warm_up() -> None:
+    """触发各内核的即时编译（已有磁盘缓存时只加载）"""
+    sample = np.arange(8, dtype=np.float64)
+    rolling_mean_std(sample, [2])
+    rolling_extrema(sample, [2])
+    rolling_high_low(sample, sample, [2])
+    ema(sample, [2])
+    ema_chain(sample, [2], adjust=True)
+
+
+def _as_float(x) -> np.ndarray:
+    return np.ascontiguousarray(x, dtype=np.float64)
+
+
+def _check_windows(windows: Sequence[int]) -> List[int]:
+    windows = [int(w) for w in windows]
+    if any(w < 1 for w in windows):
+        raise ValueError(f"窗口长度必须为正整数: {windows}")
+    return windows
+
+
+def _alphas(spans: Sequence[float]) -> np.ndarray:
+    if any(span < 1 for span in spans):
+        raise ValueError(f"EMA 周期必须不小于 1: {list(spans)}")
+    return np.asarray([2.0 / (span + 1.0) for span in spans], dtype=np.float64)
+
+
+def _mean_std_kernel_py(x, windows, ddof):
+    n, k = len(x), len(windows)
+    means = np.full((k, n), np.nan)
+    stds = np.full((k, n), np.nan)
+    count = np.zeros(k, dtype=np.int64)  # 窗口内有效值个数
+    mean = np.zeros(k)
+    m2 = np.zeros(k)
+    for i in range(n):
+        value = x[i]
+        for j in range(k):
+            w = windows[j]
+            if value == value:
+                count[j] += 1
+                delta = value - mean[j]
+                mean[j] += delta / count[j]
+                m2[j] += delta * (value - mean[j])
+            if i >= w:
+                old = x[i - w]
+                if old == old:
+                    count[j] -= 1
+                    if count[j] == 0:
+                        mean[j] = 0.0
+                        m2[j] = 0.0
+                    else:
+                        delta = old - mean[j]
+                        mean[j] -= delta / count[j]
+                        m2[j] -= delta * (old - mean[j])
+            if count[j] == w:
+                if i % w == 0:
+                    # 每 w 步按两遍法重算一次窗口，消除增量移除累积的舍入误差，摊还仍为 O(1)
+                    total = 0.0
+                    for t in range(i - w + 1, i + 1):
+                        total += x[t]
+                    mean[j] = total / w
+                    total = 0.0
+                    for t in range(i - w + 1, i + 1):
+                        total += (x[t] - mean[j]) ** 2
+                    m2[j] = total
+                means[j, i] = mean[j]
+                if w > ddof:
+                    stds[j, i] = np.sqrt(max(m2[j], 0.0) / (w - ddof))
+    return means, stds
+
+
+def _extrema_kernel_py(hi, lo, windows):
+    # hi 上求滚动最大值，lo 上求滚动最小值；单一序列的最大/最小值传入同一数组
+    n, k = len(hi), len(windows)
+    highs = np.full((k, n), np.nan)
+    lows = np.full((k, n), np.nan)
+    # 每个窗口各有一对单调队列，存放下标；队首、队尾只增不减，最多入队 n 次，
+    # 因此按序列长度预留的线性缓冲区不会越界，无需环形回绕
+    max_q = np.zeros((k, n), dtype=np.int64)
+    min_q = np.zeros((k, n), dtype=np.int64)
+    max_head = np.zeros(k, dtype=np.int64)
+    max_tail = np.zeros(k, dtype=np.int64)
+    min_head = np.zeros(k, dtype=np.int64)
+    min_tail = np.zeros(k, dtype=np.int64)
+    hi_nan = -1
+    lo_nan = -1
+    for i in range(n):
+        high = hi[i]
+        low = lo[i]
+        if high != high:
+            hi_nan = i
+        if low != low:
+            lo_nan = i
+        for j in range(k):
+            w = windows[j]
+            if high == high:
+                while max_tail[j] > max_head[j] and hi[max_q[j, max_tail[j] - 1]] <= high:
+                    max_tail[j] -= 1
+                max_q[j, max_tail[j]] = i
+                max_tail[j] += 1
+            if low == low:
+                while min_tail[j] > min_head[j] and lo[min_q[j, min_tail[j] - 1]] >= low:
+                    min_tail[j] -= 1
+                min_q[j, min_tail[j]] = i
+                min_tail[j] += 1
+            while max_tail[j] > max_head[j] and max_q[j, max_head[j]] <= i - w:
+                max_head[j] += 1
+            while min_tail[j] > min_head[j] and min_q[j, min_head[j]] <= i - w:
+                min_head[j] += 1
+            if i >= w - 1:
+                if hi_nan <= i - w:
+                    highs[j, i] = hi[max_q[j, max_head[j]]]
+                if lo_nan <= i - w:
+                    lows[j, i] = lo[min_q[j, min_head[j]]]
+    return highs, lows
+
+
+def _ema_kernel_py(x, alphas, adjust, chained):
+    # 与 pandas ewm(ignore_na=False) 的递推相同：缺失值处旧权重继续衰减
+    n, k = len(x), len(alphas)
+    out = np.full((k, n), np.nan)
+    avg = np.full(k, np.nan)
+    old_wt = np.ones(k)
+    for i in range(n):
+        value = x[i]
+        for j in range(k):
+            if chained and j > 0:
+                value = out[j - 1, i]
+            alpha = alphas[j]
+            observed = value == value
+            if avg[j] == avg[j]:
+                old_wt[j] *= 1.0 - alpha
+                if observed:
+                    new_wt = 1.0 if adjust else alpha
+                    if avg[j] != value:
+                        avg[j] = (old_wt[j] * avg[j] + new_wt * value) / (old_wt[j] + new_wt)
+                    if adjust:
+                        old_wt[j] += new_wt
+                    else:
+                        old_wt[j] = 1.0
+            elif observed:
+                avg[j] = value
+            out[j, i] = avg[j]
+    return out
+
+
+if njit is not None:
+    _mean_std_kernel = njit(cache=True, nogil=True)(_mean_std_kernel_py)
+    _extrema_kernel = njit(cache=True, nogil=True)(_extrema_kernel_py)
+    _ema_kernel = njit(cache=True, nogil=True)(_ema_kernel_py)
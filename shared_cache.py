@@ -0,0 +1,300 @@
+# shared_cache.py
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from bars import Bars
+
+try:
+    import fcntl
+except ImportError:  # Windows 下不做跨进程加锁
+    fcntl = None
+
+MAGIC = b'BARS0001'
+ALIGNMENT = 64
+TIMESTAMPS = '__timestamps__'
+
+
+def default_cache_dir() -> str:
+    """优先使用内存文件系统 /dev/shm，否则退回本地数据目录"""
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm/stock_app'
+    return './data/shared'
+
+
+class SharedBarCache:
+    """
+    多进程共享的K线缓存。
+
+    每个条目是一个按 64 字节对齐的二进制文件：文件头记录列名、类型、偏移和覆盖的日期区间，
+    其后依次存放各列原始数组。各 uvicorn worker 以只读 mmap 映射同一文件，
+    命中时直接在映射内存上构建 Bars，无需反序列化，操作系统页缓存只保留一份，
+    内存占用随品种数而非 品种数×worker数 增长。
+
+    条目按品种和周期（不含日期）建立，请求的日期区间落在条目覆盖范围内时直接切片返回，
+    否则把条目扩展到两者的并集重新加载。目录总大小超过 max_bytes 时按最近访问时间淘汰。
+
+    同一条目只由一个进程加载：未命中时先取得该条目的文件锁，
+    其余进程等待锁释放后直接映射已写入的文件。
+    """
+
+    def __init__(self, cache_dir: str = "", ttl: float = 3600, max_bytes: int = 1 << 30):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._mapped: Dict[str, Tuple[tuple, dict, Bars]] = {}
+        # 执行器中的多个线程共用同一实例，_mapped 的读写和遍历都在该锁内进行
+        self._mapped_lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_or_load(self, key: str, start_date: str, end_date: str,
+                    loader: Callable[[str, str], Tuple[Bars, str]], settled: bool = True) -> Bars:
+        """
+        读取 [start_date, end_date]（YYYY-MM-DD，含两端）的数据，未命中时加锁调用 loader(开始, 结束) 加载并写入。
+
+        loader 返回 (Bars, 实际覆盖的开始日期)。加载方只保留区间末尾部分（如分钟线的交易日上限）时，
+        开始日期晚于请求的开始日期，条目标记为截断：只有结束日期相同、开始日期不晚于覆盖起点的请求
+        才与截断后的结果相同，可直接返回整个条目。
+
+        :param settled: 已结束交易日的数据是否不再变化，为 True 时结束日期早于今天的条目永不过期；
+                        后复权的连续合约换月后历史价格整体调整，应为 False
+        """
+        bars = self.get(key, start_date, end_date)
+        if bars is not None:
+            return bars
+        with self._lock(key):
+            bars = self.get(key, start_date, end_date)
+            if bars is None:
+                load_start, load_end = self._load_range(key, start_date, end_date)
+                loaded, covered_start = loader(load_start, load_end)
+                self.put(key, loaded, max(covered_start, load_start), load_end, settled,
+                         truncated=covered_start > load_start)
+                bars = self.get(key, start_date, end_date)
+                if bars is None:  # 条目大于 max_bytes 时写入后即被淘汰
+                    bars = loaded.between(*_bounds(start_date, end_date))
+        return bars
+
+    def get(self, key: str, start_date: str, end_date: str) -> Optional[Bars]:
+        """条目未过期且覆盖所请求的区间时返回对应切片，否则返回 None"""
+        found = self._entry(key)
+        if found is None:
+            return None
+        header, bars = found
+        if header['expires'] and header['expires'] < time.time():
+            self._unmap(key)
+            return None
+        covered = header['start'] <= start_date <= end_date <= header['end']
+        if header.get('truncated'):
+            covered = covered or (start_date <= header['start'] and end_date == header['end'])
+        if not covered:
+            return None
+        return bars.between(*_bounds(start_date, end_date))
+
+    def put(self, key: str, bars: Bars, start_date: str, end_date: str, settled: bool = True,
+            truncated: bool = False) -> None:
+        """写入条目：先写临时文件再原子替换，读取方不会看到写了一半的文件"""
+        arrays = [(TIMESTAMPS, bars.timestamps)] + [(name, bars.values(name)) for name in bars.columns]
+        layout, offset = [], 0
+        for name, values in arrays:
+            layout.append({'name': name, 'dtype': values.dtype.str, 'offset': offset})
+            offset = _align(offset + values.nbytes)
+
+        final = settled and end_date < time.strftime('%Y-%m-%d')
+        header = json.dumps({
+            'key': key,
+            'start': start_date,
+            'end': end_date,
+            'truncated': truncated,
+            'rows': len(bars),
+            'float_dtype': bars.float_dtype.str,
+            'expires': 0 if final else time.time() + self.ttl,
+            'arrays': layout,
+            'categories': {name: [str(v) for v in values] for name, values in bars.categories.items()},
+        }, ensure_ascii=False).encode('utf-8')
+        data_start = _align(len(MAGIC) + 8 + len(header))
+
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(MAGIC)
+                f.write(np.uint64(len(header)).tobytes())
+                f.write(header)
+                for (name, values), entry in zip(arrays, layout):
+                    f.seek(data_start + entry['offset'])
+                    f.write(np.ascontiguousarray(values).tobytes())
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_path)
+            raise
+        logging.info(f"共享缓存写入 {key} {start_date}~{end_date}: {len(bars)} 行")
+        self.evict(keep=path)
+
+    def evict(self, keep: str = '') -> None:
+        """
+        总大小超过 max_bytes 时按最近访问时间删除条目（keep 除外），
+        并清理无人持有的锁文件和异常退出遗留的临时文件。
+        """
+        entries, total, now = [], 0, time.time()
+        with os.scandir(self.cache_dir) as it:
+            for item in it:
+                try:
+                    if item.name.endswith('.bars'):
+                        stat = item.stat()
+                        total += stat.st_size
+                        if item.path != keep:
+                            entries.append((stat.st_atime, stat.st_size, item.path))
+                    elif item.name.endswith('.lock'):
+                        self._remove_idle_lock(item.path)
+                    elif item.name.endswith('.tmp') and item.stat().st_mtime < now - self.ttl:
+                        os.remove(item.path)
+                except FileNotFoundError:
+                    continue
+
+        removed = set()
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            total -= size
+            removed.add(path)
+        if removed:
+            logging.info(f"共享缓存淘汰 {len(removed)} 个条目")
+        # 已删除的条目不再保留映射，内存在 Bars 不再被引用后释放
+        with self._mapped_lock:
+            for key in [key for key in self._mapped if self._path(key) in removed]:
+                del self._mapped[key]
+
+    def _entry(self, key: str) -> Optional[Tuple[dict, Bars]]:
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._unmap(key)
+            return None
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        with self._mapped_lock:
+            mapped = self._mapped.get(key)
+        if mapped is None or mapped[0] != signature:
+            # 映射文件不持有锁，多个线程同时映射同一条目时保留最后一次的结果
+            try:
+                header, bars = self._map(path)
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"共享缓存条目无效 {key}: {e}")
+                self._unmap(key)
+                return None
+            mapped = (signature, header, bars)
+            with self._mapped_lock:
+                self._mapped[key] = mapped
+
+        # 访问时间用于淘汰，不依赖文件系统的 atime 挂载选项，最多每分钟更新一次
+        if stat.st_atime < time.time() - 60:
+            with contextlib.suppress(OSError):
+                os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+        return mapped[1], mapped[2]
+
+    def _unmap(self, key: str) -> None:
+        with self._mapped_lock:
+            self._mapped.pop(key, None)
+
+    def _load_range(self, key: str, start_date: str, end_date: str) -> Tuple[str, str]:
+        """与已有条目的区间重叠或相邻时加载两者的并集，否则只加载请求的区间"""
+        found = self._entry(key)
+        if found is None:
+            return start_date, end_date
+        header = found[0]
+        day = pd.Timedelta(days=1)
+        if pd.Timestamp(start_date) > pd.Timestamp(header['end']) + day or \
+                pd.Timestamp(end_date) < pd.Timestamp(header['start']) - day:
+            return start_date, end_date
+        return min(start_date, header['start']), max(end_date, header['end'])
+
+    def _map(self, path: str) -> Tuple[dict, Bars]:
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError("文件头标识不匹配")
+        header_len = int(buffer[len(MAGIC):len(MAGIC) + 8].view(np.uint64)[0])
+        header_start = len(MAGIC) + 8
+        header = json.loads(bytes(buffer[header_start:header_start + header_len]).decode('utf-8'))
+        data_start = _align(header_start + header_len)
+
+        rows = header['rows']
+        arrays = {}
+        for entry in header['arrays']:
+            dtype = np.dtype(entry['dtype'])
+            start = data_start + entry['offset']
+            arrays[entry['name']] = buffer[start:start + rows * dtype.itemsize].view(dtype)
+        timestamps = arrays.pop(TIMESTAMPS)
+        categories = {name: pd.Index(values) for name, values in header['categories'].items()}
+        return header, Bars(timestamps, arrays, categories, header['float_dtype'])
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.bars')
+
+    @contextlib.contextmanager
+    def _lock(self, key: str):
+        """
+        条目级文件锁。释放前删除锁文件，避免锁文件随品种数累积；
+        等待者取得锁后若发现文件已被删除或替换，则对新文件重新加锁。
+        """
+        if fcntl is None:
+            yield
+            return
+        lock_path = self._path(key) + '.lock'
+        while True:
+            lock_file = open(lock_path, 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                if _same_file(lock_path, lock_file):
+                    break
+            except BaseException:
+                lock_file.close()
+                raise
+            lock_file.close()
+        try:
+            yield
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(lock_path)
+            lock_file.close()
+
+    @staticmethod
+    def _remove_idle_lock(lock_path: str) -> None:
+        """删除没有进程持有的锁文件（进程在释放前异常退出时遗留）"""
+        if fcntl is None:
+            return
+        with open(lock_path, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            if _same_file(lock_path, lock_file):
+                os.remove(lock_path)
+
+
+def _bounds(start_date: str, end_date: str) -> Tuple[int, int]:
+    """日期区间 [start_date, end_date] 对应的纳秒时间戳范围 [start, end)，包含结束日当天的分钟线"""
+    return pd.Timestamp(start_date).value, (pd.Timestamp(end_date) + pd.Timedelta(days=1)).value
+
+
+def _same_file(path: str, lock_file) -> bool:
+    try:
+        return os.stat(path).st_ino == os.fstat(lock_file.fileno()).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -0,0 +1,105 @@
+# tests/test_data_service.py
+"""DataService.get_bars 经共享缓存与直接获取的结果一致性测试，Tushare 接口以本地生成的日线代替"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_service import DataService  # noqa: E402
+from minute_bars import stub_minute_feed  # noqa: E402
+from shared_cache import SharedBarCache  # noqa: E402
+
+
+class FakePro:
+    """按 pro.daily 的字段和日期过滤返回确定的随机日线"""
+
+    def __init__(self, start: str = '2023-01-02', end: str = '2024-12-31'):
+        days = pd.bdate_range(start, end)
+        rng = np.random.default_rng(0)
+        close = 10 * np.exp(np.cumsum(rng.normal(0, 0.01, len(days))))
+        open_ = np.concatenate(([10.0], close[:-1]))
+        self.frame = pd.DataFrame({
+            'ts_code': '000001.SZ',
+            'trade_date': days.strftime('%Y%m%d'),
+            'open': open_,
+            'high': np.maximum(open_, close) * 1.01,
+            'low': np.minimum(open_, close) * 0.99,
+            'close': close,
+            'pre_close': open_,
+            'change': close - open_,
+            'pct_chg': (close / open_ - 1) * 100,
+            'vol': rng.integers(1_000, 100_000, len(days)).astype(float),
+            'amount': rng.integers(10_000, 1_000_000, len(days)).astype(float),
+        })
+        self.calls = 0
+
+    def daily(self, ts_code: str, start_date: str, end_date: str) -> pd.DataFrame:
+        self.calls += 1
+        dates = self.frame['trade_date']
+        # Tushare 按交易日倒序返回
+        return self.frame[(dates >= start_date) & (dates <= end_date)].iloc[::-1].reset_index(drop=True)
+
+
+def make_service(shared_cache=None, minute_dir: str = '', max_minute_sessions: int = 60) -> DataService:
+    service = DataService.__new__(DataService)
+    service.pro = FakePro()
+    service.shared_cache = shared_cache
+    service.minute_dir = minute_dir
+    service.max_minute_sessions = max_minute_sessions
+    return service
+
+
+def assert_same_bars(actual, expected):
+    assert list(actual.index) == list(expected.index)
+    assert actual.columns == expected.columns
+    for name in expected.columns:
+        # 缓存中价格为 float32，聚合后按收盘价重算的 pct_chg 有 1e-5 量级的差异
+        np.testing.assert_allclose(actual.values(name), expected.values(name), rtol=1e-6, atol=1e-4)
+
+
+@pytest.mark.parametrize('timeframe', ['D', 'W', 'M'])
+@pytest.mark.parametrize('first, second', [
+    (('2024-01-01', '2024-01-31'), ('2024-01-03', '2024-01-10')),
+    (('2024-01-01', '2024-06-30'), ('2024-02-07', '2024-05-15')),
+    (('2024-03-01', '2024-04-30'), ('2024-04-15', '2024-05-20')),
+])
+def test_cached_sub_range_matches_uncached(tmp_path, timeframe, first, second):
+    cached = make_service(SharedBarCache(str(tmp_path)))
+    cached.get_bars('000001', *first, 'stock', timeframe)
+    result = cached.get_bars('000001', *second, 'stock', timeframe)
+    assert_same_bars(result, make_service().get_bars('000001', *second, 'stock', timeframe))
+
+
+def test_weekly_and_daily_share_one_entry(tmp_path):
+    service = make_service(SharedBarCache(str(tmp_path)))
+    service.get_bars('000001', '2024-01-01', '2024-03-31', 'stock', 'D')
+    calls = service.pro.calls
+    assert service.has_cached_bars('000001', '2024-02-01', '2024-02-29', 'stock', 'W')
+    service.get_bars('000001', '2024-02-01', '2024-02-29', 'stock', 'W')
+    service.get_bars('000001', '2024-01-01', '2024-03-31', 'stock', 'M')
+    assert service.pro.calls == calls
+
+
+@pytest.fixture
+def minute_dir(tmp_path):
+    """写入 2024 年上半年的合成1分钟线"""
+    directory = tmp_path / 'minute'
+    directory.mkdir()
+    frame = pd.concat(stub_minute_feed('2024-01-01', '2024-06-28'))
+    frame.to_csv(directory / '000001.SZ.csv', index_label='datetime')
+    return str(directory)
+
+
+def test_truncated_minute_entry_does_not_cover_dropped_sessions(tmp_path, minute_dir):
+    cached = make_service(SharedBarCache(str(tmp_path / 'shm')), minute_dir, max_minute_sessions=20)
+    full = cached.get_bars('000001', '2024-01-01', '2024-06-28', 'stock', '5min')
+    assert_same_bars(full, make_service(minute_dir=minute_dir, max_minute_sessions=20)
+                     .get_bars('000001', '2024-01-01', '2024-06-28', 'stock', '5min'))
+    for start, end in [('2024-01-02', '2024-01-31'), ('2024-06-03', '2024-06-28'), ('2024-05-01', '2024-06-28')]:
+        expected = make_service(minute_dir=minute_dir, max_minute_sessions=20).get_bars('000001', start, end, 'stock', '5min')
+        assert not expected.empty
+        assert_same_bars(cached.get_bars('000001', start, end, 'stock', '5min'), expected)
@@ -0,0 +1,68 @@
+# tests/test_live_feed.py
+"""ReplayFeed 代码校验与 LiveHub 行情结束处理的测试"""
+import asyncio
+import json
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from live_feed import LiveHub, ReplayFeed  # noqa: E402
+from minute_bars import stub_minute_feed  # noqa: E402
+
+
+def write_minutes(path, start: str = '2024-01-02', end: str = '2024-01-03'):
+    pd.concat(stub_minute_feed(start, end)).to_csv(path, index_label='datetime')
+
+
+@pytest.fixture
+def minute_dir(tmp_path):
+    directory = tmp_path / 'minute'
+    directory.mkdir()
+    write_minutes(directory / '000001.SZ.csv')
+    # 目录之外的文件，以及指向它的符号链接
+    write_minutes(tmp_path / 'SECRET.csv')
+    os.symlink(tmp_path / 'SECRET.csv', directory / 'LINK.csv')
+    return directory
+
+
+@pytest.mark.parametrize('symbol', ['../SECRET', '..', '.', 'LINK', '000001.sz', '000001.SZ/', '/etc/passwd', ''])
+def test_replay_feed_rejects_paths_outside_directory(minute_dir, symbol):
+    feed = ReplayFeed(str(minute_dir), interval=0)
+    assert not feed.has(symbol)
+
+    async def subscribe():
+        with pytest.raises(ValueError):
+            LiveHub(feed).subscribe(symbol, asyncio.Queue())
+
+    asyncio.run(subscribe())
+
+
+def test_replay_feed_accepts_symbol_in_directory(minute_dir):
+    assert ReplayFeed(str(minute_dir), interval=0).has('000001.SZ')
+
+
+def test_finished_feed_closes_subscribers(minute_dir):
+    async def run():
+        hub = LiveHub(ReplayFeed(str(minute_dir), interval=0), queue_size=10_000)
+        first = hub.new_queue()
+        hub.subscribe('000001.SZ', first)
+        while hub.status()['symbols']:
+            await asyncio.sleep(0.01)
+        messages = [json.loads(first.get_nowait()) for _ in range(first.qsize())]
+        assert messages[-1] == {'symbol': '000001.SZ', 'end': True}
+        assert not hub.is_subscribed('000001.SZ', first)
+        assert hub.status()['subscribers'] == 0
+
+        # 新的订阅重新开始回放，已结束的订阅者不再收到消息
+        second = hub.new_queue()
+        hub.subscribe('000001.SZ', second)
+        await asyncio.sleep(0.05)
+        assert first.empty()
+        assert not second.empty()
+        hub.unsubscribe('000001.SZ', second)
+
+    asyncio.run(run())